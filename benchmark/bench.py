@@ -0,0 +1,253 @@
+"""Benchmark the plugin backend against fake MPRIS2 players
+
+For each player count, a private dbus-daemon is started together with that
+many fake players (see fake_player.py), and the Plugin methods from main.py
+are timed against them. A monitor connection on the same bus counts the
+D-Bus messages each operation costs.
+
+    python3 benchmark/bench.py --players 1 10 50 --art-bytes 300000
+
+Commands are timed twice: "call" is the plugin method returning, "confirmed"
+is the player's own PropertiesChanged or Seeked being reflected in the cache.
+Each command waits out COMMAND_INTERVAL for its player first, so the
+throttling in CommandQueue is not counted as latency.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARK_DIR, '..', 'pip'))
+sys.path.insert(0, os.path.join(BENCHMARK_DIR, '..'))
+
+# Longest wait for a player to confirm a command before the sample counts as failed
+CONFIRM_TIMEOUT = 5.0
+# How often confirmation is checked, this bounds the resolution of the confirmed times
+CONFIRM_POLL = 0.0005
+# The bus counts as quiet once no message went by for this long
+SETTLE_TIME = 0.1
+
+COMMANDS = ('playPause', 'nextSong', 'prevSong', 'seek', 'setVolume')
+
+def percentile(samples, fraction):
+    """Nearest-rank percentile of a list of numbers"""
+    ordered = sorted(samples)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+class MessageCounter:
+    """Counts every message on the bus through a monitor connection"""
+
+    def __init__(self, address):
+        import dbus
+        self._lock = threading.Lock()
+        self.count = 0
+        self.conn = dbus.bus.BusConnection(address)
+        self.conn.set_exit_on_disconnect(False)
+        self.conn.add_message_filter(self._filter)
+        self.conn.call_blocking(dbus.BUS_DAEMON_NAME, dbus.BUS_DAEMON_PATH,
+            'org.freedesktop.DBus.Monitoring', 'BecomeMonitor', 'asu', ([], 0))
+
+    def _filter(self, conn, message):
+        with self._lock:
+            self.count += 1
+
+    def read(self):
+        with self._lock:
+            return self.count
+
+    async def settle(self):
+        """Wait until the bus went quiet, e.g. for signals that follow a command"""
+        last = self.read()
+        while True:
+            await asyncio.sleep(SETTLE_TIME)
+            count = self.read()
+            if count == last:
+                return count
+            last = count
+
+class Measurement:
+    """Latencies and messages per call of one kind of operation"""
+
+    def __init__(self):
+        self.call = []
+        self.confirmed = []
+        self.failed = 0
+        self.messages = 0
+
+    def result(self):
+        result = {"samples": len(self.call), "failed": self.failed, "messages": self.messages}
+        for kind in ('call', 'confirmed'):
+            samples = getattr(self, kind)
+            if samples:
+                result[kind] = {"p50": percentile(samples, 0.5) * 1000,
+                                "p99": percentile(samples, 0.99) * 1000}
+        return result
+
+async def wait_until(predicate):
+    deadline = time.perf_counter() + CONFIRM_TIMEOUT
+    while not predicate():
+        if time.perf_counter() > deadline:
+            return False
+        await asyncio.sleep(CONFIRM_POLL)
+    return True
+
+async def run_command(main, plugin, service, command):
+    """Send one command and wait for the player to confirm it
+    :returns: the time the call took and the time until it was confirmed, or None
+    """
+    loop = asyncio.get_running_loop()
+    last_sent = service.commands._last_sent
+    if last_sent is not None:
+        await asyncio.sleep(max(last_sent + main.COMMAND_INTERVAL - loop.time(), 0))
+    args = {"playerId": service.name}
+    if command == 'seek':
+        args["position"] = random.randrange(0, 180 * 1000000)
+    elif command == 'setVolume':
+        args["volume"] = 0.5 if service.player_state.get('Volume') == 1.0 else 1.0
+    metadata = service._field_revisions.get(('properties', 'Metadata'))
+
+    start = time.perf_counter()
+    await getattr(plugin, command)(**args)
+    call = time.perf_counter() - start
+    if command in ('playPause', 'setVolume'):
+        # cleared when PropertiesChanged brings the value we guessed
+        confirmed = lambda: not service._optimistic
+    elif command == 'seek':
+        # the anchor moved once for the guess, Seeked moves it again
+        position = service._field_revisions.get((None, 'position'))
+        confirmed = lambda: service._field_revisions.get((None, 'position')) != position
+    else:
+        confirmed = lambda: service._field_revisions.get(('properties', 'Metadata')) != metadata
+    if not await wait_until(confirmed):
+        return call, None
+    return call, time.perf_counter() - start
+
+async def measure(main, address, player_count, samples):
+    # the bus connections run on this event loop, so they are opened here.
+    # The daemon goes away first on the way out, that must not take the process with it.
+    main.session_bus().set_exit_on_disconnect(False)
+    counter = MessageCounter(address)
+    plugin = main.Plugin()
+    results = {}
+
+    measurement = Measurement()
+    await counter.settle()
+    messages = counter.read()
+    start = time.perf_counter()
+    # players are built in the background, cold counts until the last one is in
+    revision = 0
+    while len(main.registry.services) < player_count:
+        revision = (await plugin.wait_for_change(revision))["revision"]
+    players = await plugin.get_player()
+    measurement.call.append(time.perf_counter() - start)
+    measurement.messages = await counter.settle() - messages
+    results['get_player (cold)'] = measurement.result()
+
+    for name, revision in (('get_player', None), ('get_player (delta)', main.registry.revision)):
+        measurement = Measurement()
+        messages = counter.read()
+        for _ in range(samples):
+            start = time.perf_counter()
+            await plugin.get_player(revision)
+            measurement.call.append(time.perf_counter() - start)
+        measurement.messages = (await counter.settle() - messages) / samples
+        results[name] = measurement.result()
+
+    services = [main.registry.services[player["id"]] for player in players]
+    for command in COMMANDS:
+        measurement = Measurement()
+        messages = counter.read()
+        for sample in range(samples):
+            call, confirmed = await run_command(main, plugin, services[sample % len(services)], command)
+            measurement.call.append(call)
+            if confirmed is None:
+                measurement.failed += 1
+            else:
+                measurement.confirmed.append(confirmed)
+        measurement.messages = (await counter.settle() - messages) / samples
+        results[command] = measurement.result()
+    return results
+
+def run_one(args):
+    """Measure a single player count, in this process"""
+    daemon = subprocess.Popen(['dbus-daemon', '--session', '--nofork', '--print-address=1'],
+                              stdout=subprocess.PIPE, text=True)
+    players = None
+    try:
+        address = daemon.stdout.readline().strip()
+        env = dict(os.environ, DBUS_SESSION_BUS_ADDRESS=address)
+        players = subprocess.Popen(
+            [sys.executable, os.path.join(BENCHMARK_DIR, 'fake_player.py'),
+             '--players', str(args.players[0]), '--latency', str(args.latency),
+             '--art-bytes', str(args.art_bytes), '--extra-metadata', str(args.extra_metadata)],
+            env=env, stdout=subprocess.PIPE, text=True)
+        if players.stdout.readline().strip() != 'ready':
+            raise RuntimeError('fake players did not start')
+
+        import main
+        # main.py points the bus at the Steam Deck user session on import
+        os.environ['DBUS_SESSION_BUS_ADDRESS'] = address
+        main.art_cache = main.ArtCache(tempfile.mkdtemp(prefix='bench-art-'), main.ART_CACHE_SIZE)
+        return asyncio.run(measure(main, address, args.players[0], args.samples))
+    finally:
+        for process in (players, daemon):
+            if process is not None:
+                process.terminate()
+                process.wait()
+
+def print_results(players, results):
+    print(f'\n{players} player(s)')
+    print(f'{"operation":<20} {"call p50":>9} {"call p99":>9} {"conf p50":>9} {"conf p99":>9} {"msgs/op":>8} {"failed":>6}')
+    for name, result in results.items():
+        cells = []
+        for kind in ('call', 'confirmed'):
+            timing = result.get(kind)
+            cells += [f'{timing["p50"]:9.2f}', f'{timing["p99"]:9.2f}'] if timing else [f'{"-":>9}'] * 2
+        print(f'{name:<20} {" ".join(cells)} {result["messages"]:8.1f} {result["failed"]:6}')
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--players', type=int, nargs='+', default=[1, 5, 10, 25, 50],
+                        help='player counts to measure')
+    parser.add_argument('--samples', type=int, default=50,
+                        help='calls per operation and player count')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='seconds the fake players hold back every reply')
+    parser.add_argument('--art-bytes', type=int, default=0,
+                        help='size of the inline data: art of the fake players, 0 for none')
+    parser.add_argument('--extra-metadata', type=int, default=0,
+                        help='number of padding entries in the fake Metadata')
+    parser.add_argument('--json', metavar='FILE',
+                        help='also write the results to FILE, to compare runs')
+    parser.add_argument('--single', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        json.dump(run_one(args), sys.stdout)
+        return
+
+    # every player count gets a fresh process, main.py keeps its bus and registry in globals
+    report = {"latency": args.latency, "artBytes": args.art_bytes,
+              "extraMetadata": args.extra_metadata, "results": {}}
+    for players in args.players:
+        output = subprocess.run(
+            [sys.executable, __file__, '--single', '--players', str(players),
+             '--samples', str(args.samples), '--latency', str(args.latency),
+             '--art-bytes', str(args.art_bytes), '--extra-metadata', str(args.extra_metadata)],
+            check=True, stdout=subprocess.PIPE, text=True).stdout
+        results = json.loads(output)
+        report["results"][players] = results
+        print_results(players, results)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == '__main__':
+    main()
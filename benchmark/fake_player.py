@@ -0,0 +1,206 @@
+"""Fake MPRIS2 players for the benchmark
+
+Exports a number of players on the bus given by DBUS_SESSION_BUS_ADDRESS,
+each on its own connection so they get their own unique name, the way
+separate browser tabs or media apps would. Run by bench.py, but it works on
+its own too:
+
+    python3 benchmark/fake_player.py --players 5 --art-bytes 300000
+"""
+import argparse
+import base64
+import ctypes
+import os
+import random
+import sys
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'pip'))
+
+import dbus
+import dbus.service
+from dbus.mainloop.glib import DBusGMainLoop, threads_init
+
+MPRIS_BASE = 'org.mpris.MediaPlayer2'
+PLAYER_INTERFACE = MPRIS_BASE + '.Player'
+PROPERTIES_INTERFACE = dbus.PROPERTIES_IFACE
+MPRIS_PATH = '/org/mpris/MediaPlayer2'
+TRACK_LENGTH = 180 * 1000000
+
+class FakePlayer(dbus.service.Object):
+    """Just enough of an MPRIS2 player to be driven by the plugin
+
+    Every method reply is held back for latency seconds, on a timer so that
+    calls that arrive together are answered together. State changes are
+    announced with PropertiesChanged and Seeked like a real player would.
+    """
+
+    def __init__(self, conn, index, latency, art_bytes, extra_metadata):
+        super().__init__(conn, MPRIS_PATH)
+        self.index = index
+        self.latency = latency
+        self.art_bytes = art_bytes
+        self.extra_metadata = extra_metadata
+        self.track = 0
+        self.base_state = {
+            'CanQuit': False,
+            'CanRaise': False,
+            'HasTrackList': False,
+            'Identity': f'Fake player {index}',
+            'SupportedUriSchemes': dbus.Array([], signature='s'),
+            'SupportedMimeTypes': dbus.Array([], signature='s'),
+        }
+        self.player_state = {
+            'PlaybackStatus': 'Paused',
+            'LoopStatus': 'None',
+            'Rate': 1.0,
+            'Shuffle': False,
+            'Metadata': self._metadata(),
+            'Volume': 1.0,
+            'Position': dbus.Int64(0),
+            'MinimumRate': 1.0,
+            'MaximumRate': 1.0,
+            'CanGoNext': True,
+            'CanGoPrevious': True,
+            'CanPlay': True,
+            'CanPause': True,
+            'CanSeek': True,
+            'CanControl': True,
+        }
+
+    def _metadata(self):
+        meta = {
+            'mpris:trackid': dbus.ObjectPath(f'/org/mpris/MediaPlayer2/Track/{self.track}'),
+            'mpris:length': dbus.Int64(TRACK_LENGTH),
+            'xesam:title': f'Track {self.track} of player {self.index}',
+            'xesam:artist': dbus.Array([f'Artist {self.index}'], signature='s'),
+            'xesam:album': f'Album {self.index}',
+        }
+        if self.art_bytes:
+            # new bytes for every track, so the plugin can't get away with its cached hash
+            art = random.Random(self.index * 100003 + self.track).randbytes(self.art_bytes)
+            # the plugin only takes data that starts like an image
+            art = b'\x89PNG\r\n\x1a\n' + art[8:]
+            meta['mpris:artUrl'] = 'data:image/png;base64,' + base64.b64encode(art).decode('ascii')
+        for field in range(self.extra_metadata):
+            meta[f'fake:field{field}'] = 'x' * 64
+        return dbus.Dictionary(meta, signature='sv')
+
+    def _later(self, callback, *args):
+        if self.latency:
+            threading.Timer(self.latency, callback, args).start()
+        else:
+            callback(*args)
+
+    def _changed(self, values):
+        self.player_state.update(values)
+        self.PropertiesChanged(PLAYER_INTERFACE, dbus.Dictionary(values, signature='sv'), [])
+
+    def _skip(self, reply, step):
+        reply()
+        # track numbers may go negative, every skip has to change the metadata
+        self.track += step
+        self.player_state['Position'] = dbus.Int64(0)
+        self._changed({'Metadata': self._metadata()})
+
+    @dbus.service.method(PLAYER_INTERFACE, async_callbacks=('reply', 'error'))
+    def PlayPause(self, reply, error):
+        def done():
+            reply()
+            playing = self.player_state['PlaybackStatus'] == 'Playing'
+            self._changed({'PlaybackStatus': 'Paused' if playing else 'Playing'})
+        self._later(done)
+
+    @dbus.service.method(PLAYER_INTERFACE, async_callbacks=('reply', 'error'))
+    def Next(self, reply, error):
+        self._later(lambda: self._skip(reply, 1))
+
+    @dbus.service.method(PLAYER_INTERFACE, async_callbacks=('reply', 'error'))
+    def Previous(self, reply, error):
+        self._later(lambda: self._skip(reply, -1))
+
+    @dbus.service.method(PLAYER_INTERFACE, in_signature='ox', async_callbacks=('reply', 'error'))
+    def SetPosition(self, trackid, position, reply, error):
+        def done():
+            reply()
+            if trackid == self.player_state['Metadata']['mpris:trackid'] and 0 <= position <= TRACK_LENGTH:
+                self.player_state['Position'] = dbus.Int64(position)
+                self.Seeked(position)
+        self._later(done)
+
+    @dbus.service.method(PLAYER_INTERFACE, in_signature='x', async_callbacks=('reply', 'error'))
+    def Seek(self, offset, reply, error):
+        def done():
+            reply()
+            position = min(max(self.player_state['Position'] + offset, 0), TRACK_LENGTH)
+            self.player_state['Position'] = dbus.Int64(position)
+            self.Seeked(position)
+        self._later(done)
+
+    @dbus.service.signal(PLAYER_INTERFACE, signature='x')
+    def Seeked(self, position):
+        pass
+
+    def _state(self, interface):
+        if interface == MPRIS_BASE:
+            return self.base_state
+        if interface == PLAYER_INTERFACE:
+            return self.player_state
+        raise dbus.exceptions.DBusException(
+            f'No such interface {interface}', name='org.freedesktop.DBus.Error.UnknownInterface')
+
+    @dbus.service.method(PROPERTIES_INTERFACE, in_signature='ss', out_signature='v',
+                         async_callbacks=('reply', 'error'))
+    def Get(self, interface, name, reply, error):
+        value = self._state(interface)[name]
+        self._later(reply, value)
+
+    @dbus.service.method(PROPERTIES_INTERFACE, in_signature='s', out_signature='a{sv}',
+                         async_callbacks=('reply', 'error'))
+    def GetAll(self, interface, reply, error):
+        values = dbus.Dictionary(self._state(interface), signature='sv')
+        self._later(reply, values)
+
+    @dbus.service.method(PROPERTIES_INTERFACE, in_signature='ssv', async_callbacks=('reply', 'error'))
+    def Set(self, interface, name, value, reply, error):
+        def done():
+            reply()
+            if interface == PLAYER_INTERFACE and name == 'Volume':
+                self._changed({'Volume': dbus.Double(min(max(value, 0.0), 1.0))})
+        self._later(done)
+
+    @dbus.service.signal(PROPERTIES_INTERFACE, signature='sa{sv}as')
+    def PropertiesChanged(self, interface, changed, invalidated):
+        pass
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--players', type=int, default=1)
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='seconds every method reply is held back')
+    parser.add_argument('--art-bytes', type=int, default=0,
+                        help='size of the inline data: art, 0 for none')
+    parser.add_argument('--extra-metadata', type=int, default=0,
+                        help='number of padding entries added to Metadata')
+    args = parser.parse_args()
+
+    threads_init()
+    DBusGMainLoop(set_as_default=True)
+    address = os.environ['DBUS_SESSION_BUS_ADDRESS']
+    players = []
+    names = []
+    for index in range(args.players):
+        conn = dbus.bus.BusConnection(address)
+        players.append(FakePlayer(conn, index, args.latency, args.art_bytes, args.extra_metadata))
+        # the name is only taken once the object is there to answer
+        names.append(dbus.service.BusName(f'{MPRIS_BASE}.fake.instance{index}', conn))
+
+    # tell the parent we are ready
+    print('ready', flush=True)
+    glib = ctypes.CDLL('libglib-2.0.so.0')
+    glib.g_main_loop_new.restype = ctypes.c_void_p
+    glib.g_main_loop_run.argtypes = [ctypes.c_void_p]
+    glib.g_main_loop_run(glib.g_main_loop_new(None, False))
+
+if __name__ == '__main__':
+    main()
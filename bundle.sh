@@ -8,6 +8,7 @@ cp -r pip ./releaseBundle
 cp index.html ./releaseBundle
 cp -r dist ./releaseBundle
 cp main.py ./releaseBundle
+cp mpris_worker.py ./releaseBundle
 cp plugin.json ./releaseBundle
 
 cd ./releaseBundle
@@ -7,10 +7,343 @@ os.environ["DBUS_SESSION_BUS_ADDRESS"] = "unix:path=/run/user/1000/bus"
 import sys
 sys.path.insert(0,'/home/deck/homebrew/plugins/media-controls-plugin/pip')
 
+import asyncio
+import base64
+import bisect
+import cProfile
+import hashlib
+import itertools
+import json
+import random
+import re
 import subprocess
+import threading
+import time
+import tracemalloc
 import dbus
 import sys
-from collections import deque
+import urllib.parse
+import urllib.request
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from functools import partial, wraps
+from stat import S_ISREG
+from dbus._expat_introspect_parser import process_introspection_data
+from dbus.mainloop.asyncio import DBusAsyncioMainLoop
+
+_main_loop = None
+# whether this process connected to the session bus, with the worker in use it need not
+_bus_opened = False
+
+def use_event_loop():
+    """Hook dbus-python up to the running event loop
+
+    Signals and async replies then get dispatched on the plugin loader's
+    loop without a thread of their own. Must first be called from a coroutine.
+    """
+    global _main_loop
+    if _main_loop is None:
+        _main_loop = DBusAsyncioMainLoop(set_as_default=True)
+
+def session_bus():
+    """Get the shared session bus connection, see use_event_loop"""
+    global _bus_opened
+    use_event_loop()
+    _bus_opened = True
+    return dbus.SessionBus()
+
+# The library default is 25 seconds, far too long to wait on a frozen browser tab
+CALL_TIMEOUT = 2.0
+# How long a player that did not answer its initial property fetch is left alone
+BUILD_RETRY_DELAY = 30.0
+# Longest time wait_for_change parks a request before answering notModified
+WAIT_TIMEOUT = 10.0
+# How long an optimistic state change may stand before we ask the player what really happened
+RECONCILE_DELAY = 1.5
+PLUGIN_DIR = os.path.dirname(os.path.abspath(__file__))
+# Album art is cached on disk next to the plugin, up to this many bytes
+ART_CACHE_DIR = os.path.join(PLUGIN_DIR, 'cache', 'art')
+ART_CACHE_SIZE = 32 * 1024 * 1024
+# Largest single image we read, from a file, a local server or an inline data: URI
+MAX_ART_SIZE = 4 * 1024 * 1024
+# Inline data: art is replaced by this prefix and the hash of the image
+INLINE_ART_PREFIX = 'art:'
+# Shortest time between two commands sent to the same player
+COMMAND_INTERVAL = 0.25
+# Most skips in the same direction that may be queued for a player at once
+MAX_SKIP_BURST = 3
+# Upper bounds of the latency histogram buckets, in milliseconds
+HISTOGRAM_BUCKETS = (0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+# Set to a path to have get_stats written there every STATS_INTERVAL seconds
+STATS_FILE = os.environ.get('MEDIA_CONTROLS_STATS_FILE')
+STATS_INTERVAL = 60.0
+# Debug profiling, off unless MEDIA_CONTROLS_PROFILE is set or set_profiling is called.
+# A sample of the calls gets profiled, the newest PROFILE_KEEP reports of each kind are kept.
+PROFILE_DIR = os.path.join(PLUGIN_DIR, 'cache', 'profiles')
+PROFILE_SAMPLE_RATE = 0.2
+PROFILE_KEEP = 20
+# Frames kept for each traced allocation
+TRACEMALLOC_FRAMES = 10
+# With MEDIA_CONTROLS_WORKER set, the player cache lives in a helper process
+# (mpris_worker.py) that the plugin talks to over a private D-Bus socket
+USE_WORKER = bool(os.environ.get('MEDIA_CONTROLS_WORKER'))
+WORKER_SCRIPT = os.path.join(PLUGIN_DIR, 'mpris_worker.py')
+WORKER_ADDRESS = 'unix:path=' + os.path.join(PLUGIN_DIR, 'cache', 'worker.sock')
+WORKER_INTERFACE = 'MediaControls.Worker'
+WORKER_PATH = '/MediaControls/Worker'
+WORKER_NOT_FOUND = WORKER_INTERFACE + '.Error.NotFound'
+WORKER_DISCONNECTED = 'org.freedesktop.DBus.Error.Disconnected'
+# How long a freshly started worker gets to open its socket, and how long
+# the plugin serves everything itself after the worker could not be reached
+WORKER_START_TIMEOUT = 5.0
+WORKER_RETRY_DELAY = 30.0
+# A worker without a plugin connected exits after this long
+WORKER_IDLE_TIMEOUT = 600.0
+
+def _resolve(future, result):
+    if not future.done():
+        future.set_result(result)
+
+def _reject(future, error):
+    if not future.done():
+        future.set_exception(error)
+
+def call_async(method, *args, timeout=CALL_TIMEOUT):
+    """Call a D-Bus proxy method without blocking the event loop
+    :returns: a future resolved with the reply once it arrives
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def reply_handler(*reply):
+        _resolve(future, reply[0] if len(reply) == 1 else reply or None)
+
+    def error_handler(error):
+        _reject(future, error)
+
+    method(*args, reply_handler=reply_handler, error_handler=error_handler, timeout=timeout)
+    return future
+
+# Every change to the cached player state gets the next number from here,
+# shared by all players. All of it happens on the event loop, so a reader sees
+# every change up to the highest revision it observes.
+_revisions = itertools.count(1)
+# Revisions only mean something to the process that counted them. The worker,
+# a restarted worker and the in-process fallback all start again from 1, so
+# every reply names its epoch and a revision from another one counts as 0.
+EPOCH = os.urandom(8).hex()
+
+class ChangeNotifier:
+    """Wakes up coroutines waiting for the cached state to change"""
+
+    def __init__(self):
+        self._event = None
+
+    def event(self):
+        """Get the event that the next notify() will set"""
+        if self._event is None:
+            self._event = asyncio.Event()
+        return self._event
+
+    def notify(self):
+        """Wake up everything waiting on the current event"""
+        if self._event is not None:
+            event, self._event = self._event, asyncio.Event()
+            event.set()
+
+notifier = ChangeNotifier()
+
+class Histogram:
+    """Latency distribution over the fixed HISTOGRAM_BUCKETS"""
+
+    def __init__(self):
+        self.buckets = [0] * (len(HISTOGRAM_BUCKETS) + 1)
+        self.count = 0
+        self.failed = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, milliseconds, failed=False):
+        self.buckets[bisect.bisect_left(HISTOGRAM_BUCKETS, milliseconds)] += 1
+        self.count += 1
+        self.failed += failed
+        self.total += milliseconds
+        self.max = max(self.max, milliseconds)
+
+    def quantile(self, fraction):
+        """Upper bound of the bucket the given fraction of observations falls in"""
+        seen = 0
+        for bound, count in zip(HISTOGRAM_BUCKETS, self.buckets):
+            seen += count
+            if seen >= fraction * self.count:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "failed": self.failed,
+            "meanMs": self.total / self.count if self.count else 0.0,
+            "maxMs": self.max,
+            "p50Ms": self.quantile(0.5),
+            "p99Ms": self.quantile(0.99),
+            # bucket upper bound in ms to count, the last bucket has no bound
+            "buckets": dict(zip([str(bound) for bound in HISTOGRAM_BUCKETS] + ['+Inf'], self.buckets)),
+        }
+
+class Metrics:
+    """Latency histograms of the plugin methods and of the property fetches of each player"""
+
+    def __init__(self):
+        self.started = time.time()
+        self.methods = {}
+        self.players = {}
+
+    def _observe(self, histograms, name, seconds, failed):
+        histogram = histograms.get(name)
+        if histogram is None:
+            histogram = histograms[name] = Histogram()
+        histogram.observe(seconds * 1000, failed)
+
+    def observe(self, name, seconds, failed=False):
+        """Record how long one run of name took"""
+        self._observe(self.methods, name, seconds, failed)
+
+    def observe_fetch(self, player, seconds, failed=False):
+        """Record how long a property fetch from player took"""
+        self._observe(self.players, player, seconds, failed)
+
+    def forget(self, player):
+        self.players.pop(player, None)
+
+    @contextmanager
+    def timer(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.observe(name, time.perf_counter() - start, failed=True)
+            raise
+        self.observe(name, time.perf_counter() - start)
+
+    def timed(self, name):
+        """Decorator recording the run time of a coroutine function under name"""
+        def decorator(function):
+            @wraps(function)
+            async def timed(*args, **kwargs):
+                with self.timer(name):
+                    return await function(*args, **kwargs)
+            return timed
+        return decorator
+
+    def snapshot(self):
+        snapshot = {
+            "uptime": time.time() - self.started,
+            "methods": {name: histogram.to_dict() for name, histogram in self.methods.items()},
+            "players": {name: histogram.to_dict() for name, histogram in self.players.items()},
+        }
+        # the plugin only has bus traffic of its own when it served calls without the worker
+        if _bus_opened:
+            snapshot["bus"] = session_bus().get_message_counts()
+        return snapshot
+
+    async def dump(self, path, interval):
+        """Write a snapshot to path every interval seconds, until cancelled"""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(interval)
+            await loop.run_in_executor(None, self._write, path, self.snapshot())
+
+    @staticmethod
+    def _write(path, snapshot):
+        # written next to the target and renamed, a reader never sees half a file
+        temporary = path + '.tmp'
+        with open(temporary, 'w') as f:
+            json.dump(snapshot, f, indent=2)
+        os.replace(temporary, path)
+
+metrics = Metrics()
+
+class Profiler:
+    """Opt-in cProfile and tracemalloc reports of the plugin methods
+
+    While enabled, a sample of the calls runs under cProfile, with a
+    tracemalloc snapshot taken before and after. The profile covers the
+    event loop thread only: other coroutines that run while the call is
+    suspended show up in it, work on executor threads does not.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.enabled = False
+        # cProfile can only profile one thing at a time per thread
+        self._active = False
+
+    def enable(self):
+        os.makedirs(self.directory, exist_ok=True)
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def profiled(self, name):
+        """Decorator profiling a sample of the calls to a coroutine function while enabled"""
+        def decorator(function):
+            @wraps(function)
+            async def profiled(*args, **kwargs):
+                if not self.enabled or self._active or random.random() >= PROFILE_SAMPLE_RATE:
+                    return await function(*args, **kwargs)
+                self._active = True
+                before = self._snapshot()
+                profile = cProfile.Profile()
+                profile.enable()
+                try:
+                    return await function(*args, **kwargs)
+                finally:
+                    profile.disable()
+                    self._active = False
+                    asyncio.get_running_loop().run_in_executor(
+                        None, self._write, name, profile, before, self._snapshot())
+            return profiled
+        return decorator
+
+    @staticmethod
+    def _snapshot():
+        # tracing may have been switched off halfway through a call
+        if not tracemalloc.is_tracing():
+            return None
+        return tracemalloc.take_snapshot().filter_traces(
+            (tracemalloc.Filter(False, tracemalloc.__file__),))
+
+    def _write(self, name, profile, before, after):
+        now = time.time()
+        stamp = time.strftime('%Y%m%d-%H%M%S', time.localtime(now)) + f'.{int(now * 1000) % 1000:03d}'
+        prefix = os.path.join(self.directory, f'{stamp}-{name}')
+        profile.dump_stats(prefix + '.prof')
+        if before is not None and after is not None:
+            with open(prefix + '.alloc.txt', 'w') as f:
+                f.write(f'Allocations by {name}, largest growth first\n')
+                for stat in after.compare_to(before, 'lineno')[:50]:
+                    f.write(f'{stat}\n')
+                f.write('\nLargest live allocations afterwards\n')
+                for stat in after.statistics('lineno')[:25]:
+                    f.write(f'{stat}\n')
+        self._rotate()
+
+    def _rotate(self):
+        for suffix in ('.prof', '.alloc.txt'):
+            # file names start with the time, so they sort oldest first
+            reports = sorted(entry for entry in os.listdir(self.directory) if entry.endswith(suffix))
+            for entry in reports[:-PROFILE_KEEP]:
+                os.remove(os.path.join(self.directory, entry))
+
+profiler = Profiler(PROFILE_DIR)
+if os.environ.get('MEDIA_CONTROLS_PROFILE'):
+    profiler.enable()
 
 # Backend shamelessly copied from https://github.com/airtower-luna/mpris-python/blob/main/mpris.py
 # Frontend from: https://codepen.io/JavaScriptJunkie/pen/qBWrRyg
@@ -23,31 +356,346 @@ class MprisService:
     playlists_interface = mpris_base + '.Playlists'
     # see http://dbus.freedesktop.org/doc/dbus-specification.html#standard-interfaces-properties # noqa
     properties_interface = 'org.freedesktop.DBus.Properties'
+    introspectable_interface = 'org.freedesktop.DBus.Introspectable'
 
-    def __init__(self, servicename):
-        """Initialize an MprisService object for the specified service name"""
-        bus = dbus.SessionBus()
+    def __init__(self, servicename, owner=None):
+        """Initialize an MprisService object for the specified service name
+
+        Pass the unique name owning it if known, the proxy would otherwise
+        look it up with a blocking GetNameOwner call.
+        """
+        bus = session_bus()
         self.name = servicename
-        self.proxy = bus.get_object(self.name, '/org/mpris/MediaPlayer2')
+        # every call we make passes typed arguments, so the signatures from
+        # introspection are not needed. The library would introspect with its
+        # 25 second timeout, and hold back the first GetAll until it is done.
+        self.proxy = bus.get_object(owner or self.name, '/org/mpris/MediaPlayer2', introspect=False)
         self.player = dbus.Interface(
             self.proxy, dbus_interface=self.player_interface)
-        # tracklist is an optional interface, may be None depending on service
-        self.tracklist = dbus.Interface(
-            self.proxy, dbus_interface=self.tracklist_interface)
-        # playlists is an optional interface, may be None depending on service
-        self.playlists = dbus.Interface(
-            self.proxy, dbus_interface=self.playlists_interface)
         self.properties = dbus.Interface(
             self.proxy, dbus_interface=self.properties_interface)
-        # check if optional interfaces are available
+        # cached property values, kept up to date by PropertiesChanged
+        self.base_state = {}
+        self.player_state = {}
+        self.summary = {}
+        # revision of the last change, overall and per (section, key) of the snapshot
+        self.revision = 0
+        self._field_revisions = {}
+        # player properties we guessed after a command, until the player reports them itself
+        self._optimistic = set()
+        # the Introspect call for the optional interfaces, while one is under way
+        self._introspecting = None
+        # last inline art URI we saw and the handle it was replaced with
+        self._inline_art = (None, None)
+        # where playback was at one point in time, the frontend extrapolates from there
+        self.position = None
+        self._position_time = None
+        self.commands = CommandQueue(self)
+        signal_router.add(self)
+
+    async def tracklist(self):
+        """Get the TrackList interface, None if the service does not implement it"""
+        return await self.optional_interface(self.tracklist_interface)
+
+    async def playlists(self):
+        """Get the Playlists interface, None if the service does not implement it"""
+        return await self.optional_interface(self.playlists_interface)
+
+    async def optional_interface(self, interface):
+        """Get an interface the player may or may not implement, finding out on first use
+        :returns: a dbus.Interface, or None if the service does not implement it
+        """
+        methods = await self._introspect()
+        if methods is not None:
+            supported = {key.rpartition('.')[0] for key in methods}
+        else:
+            # HasTrackList is the only hint MPRIS gives us
+            supported = {self.tracklist_interface} if self.base_state.get('HasTrackList') else set()
+        if interface not in supported:
+            return None
+        return dbus.Interface(self.proxy, dbus_interface=interface)
+
+    async def _introspect(self):
+        """Get the method signatures of the player, from the connection's cache if another proxy had them
+        :returns: the map from process_introspection_data, or None if the player can't tell
+        """
+        bus = session_bus()
+        owner, path = self.proxy.bus_name, self.proxy.object_path
+        methods = bus._get_cached_introspection(owner, path)
+        if methods is not None:
+            return methods
+        if self._introspecting is None:
+            self._introspecting = asyncio.ensure_future(call_async(
+                dbus.Interface(self.proxy, dbus_interface=self.introspectable_interface).Introspect))
         try:
-            self.get_playlists_property('PlaylistCount')
+            methods = process_introspection_data(await asyncio.shield(self._introspecting))
         except dbus.exceptions.DBusException:
-            self.playlists = None
+            # parse errors too; asked again next time
+            self._introspecting = None
+            return None
+        bus._cache_introspection(owner, path, methods)
+        return methods
+
+    def close(self):
+        """Stop listening for property changes and drop queued commands"""
+        signal_router.remove(self)
+        self.commands.clear()
+
+    async def refresh(self):
+        """Fill the property cache from the service"""
+        start = time.perf_counter()
         try:
-            self.get_tracklist_property('CanEditTracks')
+            # both requests go out before either reply is awaited
+            base_state, player_state = await asyncio.gather(
+                call_async(self.properties.GetAll, self.mpris_base),
+                call_async(self.properties.GetAll, self.player_interface))
         except dbus.exceptions.DBusException:
-            self.tracklist = None
+            metrics.observe_fetch(self.name, time.perf_counter() - start, failed=True)
+            raise
+        metrics.observe_fetch(self.name, time.perf_counter() - start)
+        self._update(self.mpris_base, base_state, replace=True)
+        self._update(self.player_interface, player_state, replace=True)
+
+    def _update(self, interface, values, replace=False):
+        """Merge values into the cache of interface"""
+        if interface == self.mpris_base:
+            cache, section = self.base_state, 'baseProps'
+        elif interface == self.player_interface:
+            cache, section = self.player_state, 'properties'
+        else:
+            return
+        if 'Metadata' in values and interface == self.player_interface:
+            values = dict(values, Metadata=self._strip_inline_art(values['Metadata']))
+        changed = []
+        for key in set(cache) - set(values) if replace else ():
+            del cache[key]
+            changed.append((section, key))
+        for key, value in values.items():
+            if key not in cache or cache[key] != value:
+                cache[key] = value
+                changed.append((section, key))
+        if interface == self.player_interface:
+            self._follow_position(values, changed)
+            self._summarize(changed)
+        self._record(changed)
+
+    def _follow_position(self, values, changed):
+        """Move the position anchor along with a player properties update"""
+        if 'Position' in values:
+            self._anchor(values['Position'])
+        elif any(('properties', key) in changed for key in ('PlaybackStatus', 'Rate', 'Metadata')):
+            # keep going from where we think playback is, until the player tells us exactly
+            self._anchor(self._extrapolated_position())
+            self.properties.Get(self.player_interface, 'Position',
+                reply_handler=self._timed(self._position_fetched),
+                error_handler=self._timed(lambda error: None, failed=True),
+                timeout=CALL_TIMEOUT)
+
+    def _anchor(self, position):
+        """Record the playback position as of now"""
+        playing = self.player_state.get('PlaybackStatus') == 'Playing'
+        rate = float(self.player_state.get('Rate', 1.0)) if playing else 0.0
+        self._position_time = time.monotonic()
+        # wall clock milliseconds, so the webview can compare it with Date.now()
+        self.position = {"position": int(position), "rate": rate, "timestamp": time.time() * 1000}
+
+    def _extrapolated_position(self):
+        if self.position is None:
+            return 0
+        elapsed = time.monotonic() - self._position_time
+        return self.position["position"] + elapsed * 1000000 * self.position["rate"]
+
+    def _timed(self, handler, failed=False):
+        """Wrap a reply or error handler of a property fetch started now, to record its latency"""
+        start = time.perf_counter()
+
+        def timed(*args):
+            metrics.observe_fetch(self.name, time.perf_counter() - start, failed)
+            handler(*args)
+        return timed
+
+    def _position_fetched(self, position):
+        self._anchor(position)
+        changed = []
+        self._summarize(changed)
+        self._record(changed)
+
+    def _seeked(self, position):
+        """Handle Seeked, runs on the event loop"""
+        self._position_fetched(position)
+
+    def _strip_inline_art(self, meta):
+        """Swap an inline data: artUrl for a short art: handle, keeping the image in the art cache
+
+        Browsers put 100-500 KB of base64 art in there, which would otherwise
+        travel in every snapshot.
+        """
+        art_url = meta.get('mpris:artUrl')
+        if not art_url or not art_url.startswith('data:'):
+            return meta
+        raw, handle = self._inline_art
+        if art_url != raw:
+            ref = art_cache.lookup(art_url)
+            if ref is None:
+                # decoded and written in the executor, no art until _inline_art_stored fills it in
+                art_cache.resolve(art_url).add_done_callback(partial(self._inline_art_stored, art_url))
+            # '' when it isn't an image, no art is better than shipping it around
+            handle = INLINE_ART_PREFIX + ref if ref else ''
+            self._inline_art = (art_url, handle)
+        meta = dict(meta)
+        meta['mpris:artUrl'] = handle
+        return meta
+
+    def _inline_art_stored(self, art_url, task):
+        """Put the handle of inline art into the cached Metadata once it is on disk"""
+        if self._inline_art[0] != art_url or 'Metadata' not in self.player_state:
+            # the track changed meanwhile
+            return
+        ref = None if task.cancelled() else task.result()
+        handle = INLINE_ART_PREFIX + ref if ref else ''
+        self._inline_art = (art_url, handle)
+        meta = dict(self.player_state['Metadata'])
+        meta['mpris:artUrl'] = handle
+        self.player_state['Metadata'] = meta
+        changed = [('properties', 'Metadata')]
+        self._summarize(changed)
+        self._record(changed)
+
+    def _summarize(self, changed):
+        """Derive the summary fields again and note the ones that changed"""
+        summary = summarize(self.player_state)
+        art_url = self.player_state.get('Metadata', {}).get('mpris:artUrl')
+        if not art_url:
+            art_ref = ''
+        elif art_url.startswith(INLINE_ART_PREFIX):
+            art_ref = art_url[len(INLINE_ART_PREFIX):]
+        else:
+            art_ref = art_cache.lookup(art_url)
+        if art_ref is None:
+            self._resolve_art(art_url)
+        summary['artRef'] = art_ref or None
+        summary['position'] = self.position
+        changed.extend((None, key) for key, value in summary.items()
+                       if key not in self.summary or self.summary[key] != value)
+        self.summary = summary
+
+    def _record(self, changed):
+        """Give the changed fields a new revision and wake up waiting requests"""
+        if not changed:
+            return
+        revision = next(_revisions)
+        for field in changed:
+            self._field_revisions[field] = revision
+        self.revision = revision
+        notifier.notify()
+
+    def stamp(self, revision):
+        """Give every field of the snapshot revision
+
+        For when the service joins the registry: a signal that came in during
+        refresh() left some fields at an older revision, and a client that
+        saw that revision would get this new player without them.
+        """
+        states = (('baseProps', self.base_state), ('properties', self.player_state), (None, self.summary))
+        self._field_revisions = {(section, key): revision for section, state in states for key in state}
+        self.revision = revision
+
+    def _resolve_art(self, url):
+        art_cache.resolve(url).add_done_callback(lambda task: self._art_resolved())
+
+    def _art_resolved(self):
+        changed = []
+        self._summarize(changed)
+        self._record(changed)
+
+    def _properties_changed(self, interface, changed, invalidated):
+        """Handle PropertiesChanged, runs on the event loop"""
+        if interface == self.player_interface:
+            self._optimistic.difference_update(changed)
+        self._update(interface, changed)
+        if invalidated:
+            # invalidated properties only tell us the value changed, one GetAll fetches all of them
+            self.properties.GetAll(interface,
+                reply_handler=self._timed(partial(self._update, interface, replace=True)),
+                error_handler=self._timed(lambda error: None, failed=True),
+                timeout=CALL_TIMEOUT)
+
+    def send(self, method, *args):
+        """Call a Player method, or set Volume, without waiting for a reply"""
+        if method == 'Volume':
+            self.properties.Set(self.player_interface, 'Volume', dbus.Double(args[0]), ignore_reply=True)
+        else:
+            getattr(self.player, method)(*args, ignore_reply=True)
+
+    def seek(self, position):
+        """Queue a jump to position (in microseconds), the position anchor moves right away"""
+        if not self.player_state.get('CanSeek'):
+            return
+        trackid = self.player_state.get('Metadata', {}).get('mpris:trackid')
+        if trackid:
+            try:
+                dbus.validate_object_path(trackid)
+            except ValueError:
+                # e.g. spotify:track:... strings, SetPosition can't take those
+                trackid = None
+        offset = position - self._extrapolated_position()
+        self._anchor(position)
+        changed = []
+        self._summarize(changed)
+        self._record(changed)
+        if trackid:
+            self.commands.push('SetPosition', dbus.ObjectPath(trackid), dbus.Int64(position))
+        else:
+            # SetPosition needs the track id, a relative Seek does not
+            self.commands.push('Seek', dbus.Int64(offset))
+
+    def set_volume(self, volume):
+        """Queue a volume change, the cached Volume changes right away"""
+        volume = dbus.Double(max(float(volume), 0.0))
+        self.expect({'Volume': volume})
+        self.commands.push('Volume', volume)
+
+    def expect(self, values):
+        """Apply the expected effect of a command to the cache, before the player confirms it"""
+        self._optimistic.update(values)
+        self._update(self.player_interface, values)
+        asyncio.get_running_loop().call_later(RECONCILE_DELAY, self._reconcile)
+
+    def expect_toggle(self):
+        """Flip PlaybackStatus in the cache, for a PlayPause"""
+        playing = self.player_state.get('PlaybackStatus') == 'Playing'
+        self.expect({'PlaybackStatus': 'Paused' if playing else 'Playing'})
+
+    def _reconcile(self):
+        """Refetch the player properties if the player never reported the ones we guessed"""
+        if not self._optimistic:
+            return
+        self._optimistic.clear()
+        self.properties.GetAll(self.player_interface,
+            reply_handler=self._timed(partial(self._update, self.player_interface, replace=True)),
+            error_handler=self._timed(lambda error: None, failed=True),
+            timeout=CALL_TIMEOUT)
+
+    def snapshot(self):
+        """Get the cached state of the player, in the shape the frontend expects"""
+        return {"id": self.name, **self.summary, "baseProps": dict(self.base_state), "properties": dict(self.player_state)}
+
+    def delta(self, since):
+        """Get the snapshot fields that changed after revision since
+        :returns: a partial snapshot, removed properties are None, or None if nothing changed
+        """
+        if self.revision <= since:
+            return None
+        changes = {"id": self.name, "baseProps": {}, "properties": {}}
+        states = {"baseProps": self.base_state, "properties": self.player_state}
+        for (section, key), revision in self._field_revisions.items():
+            if revision <= since:
+                continue
+            if section is None:
+                changes[key] = self.summary[key]
+            else:
+                changes[section][key] = states[section].get(key)
+        return changes
 
     def base_properties(self):
         """Get all basic service properties"""
@@ -69,16 +717,428 @@ class MprisService:
         """Get the tracklist property described by name"""
         return self.properties.Get(self.tracklist_interface, name)
 
-def get_services():
+class SignalRouter:
+    """Routes the signals of all players to their MprisService, by sender
+
+    Subscribing per player would cost two match rules per player in the bus
+    daemon, plus a name owner watch each. This subscribes once per signal
+    for every MPRIS player, and finds the service for each signal with one
+    lookup of the sender's unique name.
+    """
+
+    def __init__(self):
+        # unique name -> services of the names it owns, one connection may own
+        # several, e.g. org.mpris.MediaPlayer2.vlc and ...vlc.instance<pid>
+        self._services = {}
+        self._matches = None
+
+    def add(self, service):
+        """Deliver the signals from the owner of service's proxy to service"""
+        if self._matches is None:
+            self._subscribe()
+        self._services.setdefault(service.proxy.bus_name, set()).add(service)
+
+    def remove(self, service):
+        owner = service.proxy.bus_name
+        services = self._services.get(owner)
+        if services is not None:
+            services.discard(service)
+            if not services:
+                del self._services[owner]
+
+    def close(self):
+        """Unsubscribe from the players' signals, until the next add"""
+        for match in self._matches or ():
+            match.remove()
+        self._matches = None
+        self._services.clear()
+
+    def _subscribe(self):
+        bus = session_bus()
+        self._matches = [
+            # arg0namespace covers the interface argument of every MPRIS interface
+            bus.add_signal_receiver(self._properties_changed, 'PropertiesChanged',
+                                    dbus_interface=MprisService.properties_interface,
+                                    path='/org/mpris/MediaPlayer2',
+                                    arg0namespace=MprisService.mpris_base,
+                                    sender_keyword='sender'),
+            # Position is not covered by PropertiesChanged, players send Seeked for jumps instead
+            bus.add_signal_receiver(self._seeked, 'Seeked',
+                                    dbus_interface=MprisService.player_interface,
+                                    path='/org/mpris/MediaPlayer2',
+                                    sender_keyword='sender'),
+        ]
+
+    def _properties_changed(self, interface, changed, invalidated, sender=None):
+        # copied, a handler may close a service
+        for service in list(self._services.get(sender, ())):
+            service._properties_changed(interface, changed, invalidated)
+
+    def _seeked(self, position, sender=None):
+        for service in list(self._services.get(sender, ())):
+            service._seeked(position)
+
+signal_router = SignalRouter()
+
+def session_uid():
+    """Get the user owning the session bus, None if it can't be told
+
+    The plugin runs as root, but artUrls come from any client of that
+    user's bus, so only files of that user may be read for them.
+    """
+    match = re.match('unix:path=([^,;]+)', os.environ.get('DBUS_SESSION_BUS_ADDRESS', ''))
+    if match is None:
+        return None
+    try:
+        return os.stat(urllib.parse.unquote(match[1])).st_uid
+    except OSError:
+        return None
+
+def _read_file(path):
+    """Read a regular file of the session user, up to MAX_ART_SIZE bytes"""
+    # O_NONBLOCK, so a FIFO can't keep us waiting before the checks below
+    fd = os.open(path, os.O_RDONLY | os.O_NOFOLLOW | os.O_NONBLOCK)
+    with os.fdopen(fd, 'rb') as file:
+        stat = os.fstat(fd)
+        if not S_ISREG(stat.st_mode) or stat.st_uid != session_uid():
+            return None
+        return file.read(MAX_ART_SIZE + 1)
+
+def fetch_art(url):
+    """Get the image behind an artUrl, blocks
+    :returns: the image bytes, or None for URLs the webview is better off loading itself,
+        and for anything too large or not an image
+    """
+    if url.startswith('data:'):
+        header, _, payload = url.partition(',')
+        if len(payload) > MAX_ART_SIZE * 2:
+            return None
+        if header.endswith(';base64'):
+            data = base64.b64decode(payload)
+        else:
+            data = urllib.parse.unquote_to_bytes(payload)
+    else:
+        parsed = urllib.parse.urlparse(url)
+        if parsed.scheme == 'file':
+            data = _read_file(urllib.request.url2pathname(parsed.path))
+        elif parsed.scheme in ('http', 'https') and parsed.hostname in ('localhost', '127.0.0.1', '::1'):
+            with urllib.request.urlopen(url, timeout=CALL_TIMEOUT) as response:
+                data = response.read(MAX_ART_SIZE + 1)
+        else:
+            return None
+    if data is None or len(data) > MAX_ART_SIZE or image_type(data) is None:
+        return None
+    return data
+
+def image_type(data):
+    """Guess the MIME type of an image from its first bytes
+    :returns: the type, or None if data does not look like an image
+    """
+    if data.startswith(b'\x89PNG'):
+        return 'image/png'
+    if data.startswith(b'\xff\xd8'):
+        return 'image/jpeg'
+    if data[:6] in (b'GIF87a', b'GIF89a'):
+        return 'image/gif'
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'image/webp'
+    if data.lstrip().startswith(b'<') and b'<svg' in data[:4096]:
+        return 'image/svg+xml'
+    return None
+
+class ArtCache:
+    """Album art, resolved once per artUrl and stored on disk by content hash
+
+    The frontend gets the hash as a short reference and loads the image
+    through get_art. Files are touched when used, and the least recently
+    used ones are deleted once the directory grows past max_size.
+    """
+
+    # how many artUrl -> reference mappings to remember
+    max_urls = 256
+
+    def __init__(self, directory, max_size):
+        self.directory = directory
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        # url (or its hash, for huge data: URIs) -> reference, '' if the url can't be cached
+        self._refs = OrderedDict()
+        self._pending = {}
+        # reference -> file size, least recently used first; read from disk on first use
+        self._files = None
+        self._size = 0
+
+    @staticmethod
+    def _key(url):
+        return url if len(url) <= 1024 else hashlib.sha1(url.encode()).hexdigest()
+
+    def lookup(self, url):
+        """Get the reference for url without doing any I/O
+        :returns: the reference, '' if the url is not cacheable, or None if it was not resolved yet
+        """
+        with self._lock:
+            return self._refs.get(self._key(url))
+
+    def resolve(self, url):
+        """Resolve url in the background, must run on the event loop
+        :returns: a task giving the reference, see lookup
+        """
+        key = self._key(url)
+        task = self._pending.get(key)
+        if task is None:
+            task = self._pending[key] = asyncio.ensure_future(self._resolve(url, key))
+        return task
+
+    async def _resolve(self, url, key):
+        try:
+            ref = await asyncio.get_running_loop().run_in_executor(None, self._store, url)
+        except Exception:
+            # unreadable file, dead local server... show no art rather than retrying on every update
+            ref = ''
+        finally:
+            self._pending.pop(key, None)
+        with self._lock:
+            self._refs[key] = ref
+            while len(self._refs) > self.max_urls:
+                self._refs.popitem(last=False)
+        return ref
+
+    def _store(self, url):
+        data = fetch_art(url)
+        if data is None:
+            return ''
+        return self._write(data)
+
+    def _write(self, data):
+        """Put data on disk under its hash, unless it is there already
+        :returns: the reference
+        """
+        ref = hashlib.sha1(data).hexdigest()
+        path = os.path.join(self.directory, ref)
+        with self._lock:
+            self._load()
+            if ref in self._files:
+                self._files.move_to_end(ref)
+                return ref
+        # only the plugin itself gets to read the cache
+        with os.fdopen(os.open(path + '.tmp', os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'wb') as file:
+            file.write(data)
+        os.replace(path + '.tmp', path)
+        with self._lock:
+            self._files[ref] = len(data)
+            self._size += len(data)
+            self._evict()
+        return ref
+
+    def _load(self):
+        """Index the files already on disk, with the lock held"""
+        if self._files is not None:
+            return
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+        # makedirs leaves the mode of a directory made by an older version alone
+        os.chmod(self.directory, 0o700)
+        entries = [entry for entry in os.scandir(self.directory) if self.is_ref(entry.name)]
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+        self._files = OrderedDict((entry.name, entry.stat().st_size) for entry in entries)
+        self._size = sum(self._files.values())
+
+    def _evict(self):
+        """Delete the least recently used files until we fit, with the lock held"""
+        while self._size > self.max_size and len(self._files) > 1:
+            ref, size = self._files.popitem(last=False)
+            self._size -= size
+            try:
+                os.remove(os.path.join(self.directory, ref))
+            except OSError:
+                pass
+
+    @staticmethod
+    def is_ref(ref):
+        return isinstance(ref, str) and re.fullmatch('[0-9a-f]{40}', ref) is not None
+
+    def read(self, ref):
+        """Get the image for a reference as a data: URI, blocks
+        :returns: the URI, or None if the image is not (or no longer) cached
+        """
+        if not self.is_ref(ref):
+            return None
+        path = os.path.join(self.directory, ref)
+        try:
+            with open(path, 'rb') as file:
+                data = file.read()
+            os.utime(path)
+        except OSError:
+            return None
+        with self._lock:
+            self._load()
+            if ref in self._files:
+                self._files.move_to_end(ref)
+        mime_type = image_type(data)
+        if mime_type is None:
+            # cached by a version that did not check
+            return None
+        return f'data:{mime_type};base64,' + base64.b64encode(data).decode('ascii')
+
+art_cache = ArtCache(ART_CACHE_DIR, ART_CACHE_SIZE)
+
+class CommandQueue:
+    """Ordered queue of the control commands for one player
+
+    Commands go out one at a time, at most one every COMMAND_INTERVAL, so a
+    burst of presses can't flood a slow player. Commands that are still
+    waiting are coalesced: two PlayPause cancel out, skips in the same
+    direction are capped at MAX_SKIP_BURST, relative seeks add up, and for
+    absolute writes coming from sliders only the latest value is kept.
+    """
+
+    # commands where a newer call makes queued ones pointless
+    latest_wins = ('SetPosition', 'Volume')
+
+    def __init__(self, service):
+        self.service = service
+        self.pending = deque()
+        self._task = None
+        self._last_sent = None
+
+    def push(self, method, *args):
+        """Queue a Player method call, must run on the event loop"""
+        if method == 'PlayPause':
+            # the toggle shows up right away, whether or not it's ever sent
+            self.service.expect_toggle()
+            if self.pending and self.pending[-1][0] == 'PlayPause':
+                self.pending.pop()
+                return
+        elif method in ('Next', 'Previous'):
+            burst = 0
+            for queued, _ in reversed(self.pending):
+                if queued != method:
+                    break
+                burst += 1
+            if burst >= MAX_SKIP_BURST:
+                return
+        elif method in self.latest_wins:
+            self.pending = deque(command for command in self.pending if command[0] != method)
+        elif method == 'Seek' and self.pending and self.pending[-1][0] == 'Seek':
+            args = (dbus.Int64(self.pending.pop()[1][0] + args[0]),)
+        self.pending.append((method, args))
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+
+    def clear(self):
+        """Drop everything that was not sent yet"""
+        self.pending.clear()
+        if self._task is not None:
+            self._task.cancel()
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while self.pending:
+            if self._last_sent is not None:
+                delay = self._last_sent + COMMAND_INTERVAL - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                # coalescing may have emptied the queue while we slept
+                if not self.pending:
+                    break
+            method, args = self.pending.popleft()
+            self.service.send(method, *args)
+            self._last_sent = loop.time()
+
+def summarize(player_state):
+    """Derive the fields the frontend displays from the player properties"""
+    meta = player_state.get('Metadata', {})
+    title = meta.get('xesam:title') or meta.get('xesam:url')
+    artist = '[Unknown]'
+    artists = meta.get('xesam:artist')
+
+    if artists:
+        artists = deque(artists)
+        artist = artists.popleft()
+        while len(artists) > 0:
+            artist = artist + ', ' + artists.popleft()
+
+    return {"playbackStatus": player_state.get('PlaybackStatus'), "title": title, "artist": artist}
+
+class MprisDiscovery:
+    """Index of the MPRIS2 services on the bus and their current owners
+
+    The bus is listed once on startup, after that the index follows
+    NameOwnerChanged so polls never have to list every name on the bus.
+    """
+
+    def __init__(self):
+        self._match = None
+        self._seeded = None
+        self.owners = {}
+
+    async def start(self):
+        """Subscribe to name changes and seed the index from the bus"""
+        if self._seeded is None:
+            self._seeded = asyncio.ensure_future(self._seed())
+            self._seeded.add_done_callback(self._seed_done)
+        await asyncio.shield(self._seeded)
+
+    def _seed_done(self, task):
+        # e.g. the plugin loader came up before the session bus, the next call tries again
+        if (task.cancelled() or task.exception() is not None) and self._seeded is task:
+            self._seeded = None
+
+    @metrics.timed('discovery')
+    async def _seed(self):
+        bus = session_bus()
+        daemon = dbus.Interface(
+            bus.get_object(dbus.BUS_DAEMON_NAME, dbus.BUS_DAEMON_PATH, introspect=False),
+            dbus_interface=dbus.BUS_DAEMON_IFACE)
+        # subscribe before listing, so names appearing in between are not missed.
+        # The owners we know are handed to MprisService, so get_object needs no
+        # GetNameOwner round-trip for them.
+        if self._match is None:
+            # kept when listing the names fails, _seed runs again then
+            self._match = bus.track_name_owners(
+                MprisService.mpris_base, self._name_owner_changed)
+        names = [name for name in await call_async(daemon.ListNames)
+                 if name.startswith(MprisService.mpris_base + '.')]
+        owners = await asyncio.gather(
+            *(call_async(daemon.GetNameOwner, name) for name in names),
+            return_exceptions=True)
+        for name, owner in zip(names, owners):
+            # an error means the name was gone again before we got to it
+            if not isinstance(owner, Exception):
+                self.owners.setdefault(name, owner)
+
+    def _name_owner_changed(self, name, old_owner, new_owner):
+        """Handle NameOwnerChanged, runs on the event loop"""
+        if new_owner:
+            self.owners[name] = new_owner
+        else:
+            self.owners.pop(name, None)
+        # the registry only picks the change up when someone asks for the players
+        notifier.notify()
+
+    def close(self):
+        """Stop following name changes, the next call lists the bus again"""
+        if self._match is not None:
+            self._match.remove()
+            self._match = None
+        if self._seeded is not None:
+            self._seeded.cancel()
+            self._seeded = None
+        self.owners.clear()
+
+    async def services(self):
+        """Get the known MPRIS2 services
+        :returns: a dict mapping well-known names to their unique owner
+        """
+        await self.start()
+        return dict(self.owners)
+
+discovery = MprisDiscovery()
+
+async def get_services():
     """Get the list of available MPRIS2 services
     :returns: a list of strings
     """
-    services = []
-    bus = dbus.SessionBus()
-    for s in bus.list_names():
-        if s.startswith(MprisService.mpris_base):
-            services.append(s)
-    return services
+    return list(await discovery.services())
 
 def _open_service(services, select):
     # try to open a service from the given list "services" by number
@@ -98,6 +1158,327 @@ def _open_service(services, select):
             print(f'MPRIS2 service "{args.service}" not found.')
     return service
 
+class MprisRegistry:
+    """Long-lived collection of MprisService objects, keyed by bus name
+
+    Building an MprisService costs the initial property fetch, so each
+    service is built once and reused until its name disappears from the bus.
+    """
+
+    def __init__(self):
+        self.services = {}
+        # name -> task building its service, shared by everyone asking meanwhile
+        self._adding = {}
+        # name -> (owner, event loop time) of a failed build, not retried for that owner before then
+        self._failed = {}
+        # revision of the last time a service was added or evicted
+        self.revision = 0
+
+    async def sync(self, owners):
+        """Bring the registry in line with the services on the bus
+        :param owners: a dict mapping well-known names to their unique owner
+        :returns: the MprisService objects for the names, in the same order
+        """
+        for name, service in list(self.services.items()):
+            # a new owner means the player restarted, the old proxy points to a dead connection
+            if owners.get(name) != service.proxy.bus_name:
+                self.evict(name)
+        for name in list(self._failed):
+            if name not in owners:
+                del self._failed[name]
+        names = list(owners)
+        # new players are set up in the background, a frozen one must not hold up
+        # the others. Each shows up with the registry revision once it is ready.
+        for name in names:
+            if name not in self.services and not self._backing_off(name, owners[name]):
+                self._add(name, owners[name])
+        return [self.services[name] for name in names if name in self.services]
+
+    async def get(self, name):
+        """Get the service for name, building it if it is not known yet"""
+        if name not in self.services:
+            owner = (await discovery.services()).get(name)
+            if owner is not None and not self._backing_off(name, owner):
+                await self._add(name, owner)
+        if name not in self.services:
+            raise KeyError(f'MPRIS2 service "{name}" not found.')
+        return self.services[name]
+
+    def _backing_off(self, name, owner):
+        """Whether building the service for name failed lately, with the same owner"""
+        failed = self._failed.get(name)
+        return (failed is not None and failed[0] == owner
+                and asyncio.get_running_loop().time() < failed[1])
+
+    def _add(self, name, owner):
+        """Build the service for name, or join the build already under way
+        :returns: a future resolved once the service is in the registry, or failed to build
+        """
+        task = self._adding.get(name)
+        if task is None:
+            task = self._adding[name] = asyncio.ensure_future(self._build(name, owner))
+            task.add_done_callback(lambda task: self._adding.pop(name, None))
+        # a caller giving up must not cancel the build for the others
+        return asyncio.shield(task)
+
+    async def _build(self, name, owner):
+        # only ever one build per name, a second service for the same name
+        # would get the signals meant for the first one as well
+        service = None
+        try:
+            service = MprisService(name, owner)
+            await service.refresh()
+        except asyncio.CancelledError:
+            if service is not None:
+                service.close()
+            raise
+        except dbus.exceptions.DBusException:
+            # the player went away or did not answer in time. A frozen one would
+            # otherwise be asked again on every wake-up of wait_for_change.
+            if service is not None:
+                service.close()
+            self._failed[name] = (owner, asyncio.get_running_loop().time() + BUILD_RETRY_DELAY)
+            return
+        self._failed.pop(name, None)
+        self.services[name] = service
+        self.revision = next(_revisions)
+        service.stamp(self.revision)
+        notifier.notify()
+
+    def evict(self, name):
+        """Forget the service for name, e.g. after its owner went away"""
+        service = self.services.pop(name, None)
+        self.revision = next(_revisions)
+        notifier.notify()
+        if service is not None:
+            service.close()
+        metrics.forget(name)
+
+    def clear(self):
+        """Drop every service and abandon the builds under way"""
+        for task in list(self._adding.values()):
+            task.cancel()
+        for name in list(self.services):
+            self.evict(name)
+        self._failed.clear()
+
+registry = MprisRegistry()
+
+def changes_since(players, since, epoch=None):
+    """Describe how the given players changed after revision since
+    :param epoch: the EPOCH since was counted in, None for this one
+    :returns: the current revision, the ids of all players in order and
+        partial snapshots of the players that changed, or notModified
+    """
+    foreign = epoch is not None and epoch != EPOCH
+    if foreign:
+        since = 0
+    revision = max([registry.revision] + [player.revision for player in players])
+    if revision <= since and not foreign:
+        return {"revision": since, "epoch": EPOCH, "notModified": True}
+    changed = [player.delta(since) for player in players]
+    return {
+        "revision": revision,
+        "epoch": EPOCH,
+        "ids": [player.name for player in players],
+        "players": [delta for delta in changed if delta is not None],
+    }
+
+class LocalBackend:
+    """Serves the plugin methods from the player cache in this process"""
+
+    async def get_player(self, revision=None, epoch=None):
+        services = await discovery.services()
+
+        # served from the PropertiesChanged-fed cache, no bus traffic for known players
+        players = await registry.sync(services)
+        if revision is None:
+            return [player.snapshot() for player in players]
+        return changes_since(players, revision, epoch)
+
+    async def wait_for_change(self, revision=0, timeout=WAIT_TIMEOUT, epoch=None):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + min(timeout, WAIT_TIMEOUT)
+        while True:
+            # taken before looking at the state, so a change in between still wakes us up
+            event = notifier.event()
+            players = await registry.sync(await discovery.services())
+            changes = changes_since(players, revision, epoch)
+            remaining = deadline - loop.time()
+            if "notModified" not in changes or remaining <= 0:
+                return changes
+            try:
+                await asyncio.wait_for(event.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+
+    async def command(self, player_id, command, *args):
+        """Queue a command for a player: a Player method, or Seek to an absolute position, or Volume
+        :raises KeyError: if there is no such player
+        """
+        service = await registry.get(player_id)
+        if command == 'Seek':
+            service.seek(int(args[0]))
+        elif command == 'Volume':
+            service.set_volume(args[0])
+        else:
+            service.commands.push(command)
+
+    async def get_art(self, ref):
+        return await asyncio.get_running_loop().run_in_executor(None, art_cache.read, ref)
+
+    async def get_stats(self):
+        return metrics.snapshot()
+
+    def close(self):
+        """Let go of the players and the bus matches, they are set up again on the next call"""
+        registry.clear()
+        signal_router.close()
+        discovery.close()
+
+local_backend = LocalBackend()
+
+class WorkerClient:
+    """Forwards the plugin methods to mpris_worker.py, same methods as LocalBackend
+
+    The worker is started on first use and keeps running across plugin
+    reloads, with its cache warm. Whenever it can't be reached the call is
+    answered by the fallback backend in this process, and the worker is
+    tried again after WORKER_RETRY_DELAY. Once it answers again the
+    fallback's players and matches are let go of.
+    """
+
+    def __init__(self, address, fallback):
+        self.address = address
+        self.fallback = fallback
+        self._connection = None
+        self._worker = None
+        self._connecting = None
+        self._retry_at = 0.0
+        # calls awaiting a reply from the worker -> the connection they were sent on
+        self._pending = {}
+        # calls the fallback is answering right now, and whether it has state to let go of
+        self._fallback_calls = 0
+        self._fallback_used = False
+
+    async def _connect(self):
+        try:
+            return self._open()
+        except dbus.exceptions.DBusException:
+            pass
+        # a session of its own, so it outlives the plugin loader restarting the plugin
+        subprocess.Popen([sys.executable, WORKER_SCRIPT, self.address,
+                          os.environ["DBUS_SESSION_BUS_ADDRESS"]],
+                         stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                         stderr=subprocess.DEVNULL, start_new_session=True)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + WORKER_START_TIMEOUT
+        while True:
+            await asyncio.sleep(0.05)
+            try:
+                return self._open()
+            except dbus.exceptions.DBusException:
+                if loop.time() > deadline:
+                    raise
+
+    def _open(self):
+        # the session bus is the worker's business, this process only talks to the worker
+        use_event_loop()
+        conn = dbus.connection.Connection(self.address)
+        conn.call_on_disconnection(self._disconnected)
+        self._connection = conn
+        return dbus.Interface(conn.get_object(None, WORKER_PATH, introspect=False),
+                              dbus_interface=WORKER_INTERFACE)
+
+    def _disconnected(self, conn):
+        if conn is self._connection:
+            self._connection = None
+            self._worker = None
+        # libdbus never completes the calls still pending on a lost peer-to-peer connection
+        for future, sent_on in list(self._pending.items()):
+            if sent_on is conn:
+                _reject(future, dbus.exceptions.DBusException(
+                    'Lost the connection to the worker', name=WORKER_DISCONNECTED))
+
+    async def _call(self, fallback, method, *args, timeout=CALL_TIMEOUT):
+        """Call a worker method and decode its JSON reply, or run fallback if the worker is unreachable
+
+        Errors of a worker that is still connected, e.g. a timeout, are raised
+        like those of the fallback would be.
+        """
+        loop = asyncio.get_running_loop()
+        if self._worker is None:
+            if loop.time() < self._retry_at:
+                return await self._fall_back(fallback)
+            try:
+                if self._connecting is None or self._connecting.done():
+                    self._connecting = asyncio.ensure_future(self._connect())
+                self._worker = await asyncio.shield(self._connecting)
+            except dbus.exceptions.DBusException:
+                # would not start
+                self._retry_at = loop.time() + WORKER_RETRY_DELAY
+                return await self._fall_back(fallback)
+            self._release_fallback()
+        connection = self._connection
+        reply = call_async(getattr(self._worker, method), *args, timeout=timeout)
+        self._pending[reply] = connection
+        reply.add_done_callback(self._pending.pop)
+        try:
+            return json.loads(await reply)
+        except dbus.exceptions.DBusException as error:
+            if error.get_dbus_name() == WORKER_NOT_FOUND:
+                raise KeyError(error.get_dbus_message())
+            if connection is not None and connection.get_is_connected():
+                raise
+        # crashed or went away mid-call
+        self._disconnected(connection)
+        self._retry_at = loop.time() + WORKER_RETRY_DELAY
+        return await self._fall_back(fallback)
+
+    async def _fall_back(self, fallback):
+        self._fallback_calls += 1
+        self._fallback_used = True
+        try:
+            return await fallback()
+        finally:
+            self._fallback_calls -= 1
+            self._release_fallback()
+
+    def _release_fallback(self):
+        """Close the fallback once the worker answers for it and no call needs it any more"""
+        if self._worker is not None and self._fallback_used and not self._fallback_calls:
+            self._fallback_used = False
+            self.fallback.close()
+
+    async def get_player(self, revision=None, epoch=None):
+        return await self._call(partial(self.fallback.get_player, revision, epoch),
+                                'GetPlayer', dbus.Int64(-1 if revision is None else revision),
+                                epoch or '')
+
+    async def wait_for_change(self, revision=0, timeout=WAIT_TIMEOUT, epoch=None):
+        timeout = min(timeout, WAIT_TIMEOUT)
+        return await self._call(partial(self.fallback.wait_for_change, revision, timeout, epoch),
+                                'WaitForChange', dbus.Int64(revision), dbus.Double(timeout),
+                                epoch or '', timeout=timeout + CALL_TIMEOUT)
+
+    async def command(self, player_id, command, *args):
+        return await self._call(partial(self.fallback.command, player_id, command, *args),
+                                'Command', player_id, command, json.dumps(args))
+
+    async def get_art(self, ref):
+        return await self._call(partial(self.fallback.get_art, ref), 'GetArt', ref)
+
+    async def get_stats(self):
+        stats = await self.fallback.get_stats()
+        stats["worker"] = await self._call(self._unreachable, 'GetStats')
+        return stats
+
+    @staticmethod
+    async def _unreachable():
+        return None
+
+backend = WorkerClient(WORKER_ADDRESS, local_backend) if USE_WORKER else local_backend
+
 class Plugin:
     # The name of the plugin. This string will be displayed in the Plugin menu
     name = "Media Controls"
@@ -111,45 +1492,67 @@ class Plugin:
 
     hot_reload = False
 
-    async def __main(self):
-        tile_view_html = ""
+    async def _main(self):
+        if STATS_FILE:
+            asyncio.ensure_future(metrics.dump(STATS_FILE, STATS_INTERVAL))
 
+    @metrics.timed('get_player')
+    @profiler.profiled('get_player')
+    async def get_player(self, revision=None, epoch=None):
+        return await backend.get_player(revision, epoch)
 
-    async def get_player(self):
-        services = get_services()
+    async def wait_for_change(self, revision=0, timeout=WAIT_TIMEOUT, epoch=None):
+        """Long-poll variant of get_player(revision, epoch)
 
-        players = []
-        for service_id in services:
-            defaultPlayer = MprisService(service_id)
+        Waits until the cached state moves past revision, or until timeout
+        seconds have passed, and then answers like get_player(revision, epoch).
+        """
+        return await backend.wait_for_change(revision, timeout, epoch)
 
-            playbackStatus = defaultPlayer.get_player_property('PlaybackStatus')
-            meta = defaultPlayer.get_player_property('Metadata')
-            
-            title = meta.get('xesam:title') or meta.get('xesam:url')
-            artist = '[Unknown]'
-            artists = meta.get('xesam:artist')
+    @metrics.timed('seek')
+    @profiler.profiled('seek')
+    async def seek(self, **kwargs):
+        await backend.command(kwargs["playerId"], 'Seek', int(kwargs["position"]))
 
-            if artists:
-                artists = deque(artists)
-                artist = artists.popleft()
-                while len(artists) > 0:
-                    artist = artist + ', ' + artists.popleft()
-            
-            baseProps = defaultPlayer.base_properties()
-            player_properties = defaultPlayer.player_properties()
+    @metrics.timed('setVolume')
+    @profiler.profiled('setVolume')
+    async def setVolume(self, **kwargs):
+        await backend.command(kwargs["playerId"], 'Volume', kwargs["volume"])
 
-            players.append({"id": service_id,"playbackStatus": playbackStatus, "title": title, "artist": artist, "baseProps": baseProps, "properties": player_properties})
+    async def get_stats(self):
+        """Latency histograms of the plugin methods, discovery and each player's
+        property fetches, and the number of D-Bus messages sent and received.
+        With the worker in use, its own stats are under "worker", and the
+        plugin only reports bus messages if it had to serve calls itself.
+        """
+        return await backend.get_stats()
 
-        return players
+    async def set_profiling(self, enabled):
+        """Switch debug profiling of get_player and the control methods on or off
+        :returns: whether profiling is on and the directory the reports are written to
+        """
+        if enabled:
+            profiler.enable()
+        else:
+            profiler.disable()
+        return {"enabled": profiler.enabled, "directory": profiler.directory}
 
+    async def get_art(self, artRef):
+        """Get the album art for a reference from a player's artRef, as a data: URI"""
+        return await backend.get_art(artRef)
+
+    @metrics.timed('playPause')
+    @profiler.profiled('playPause')
     async def playPause(self, **kwargs):
-        service = MprisService(kwargs["playerId"])
-        service.player.PlayPause()
+        await backend.command(kwargs["playerId"], 'PlayPause')
     
+    @metrics.timed('prevSong')
+    @profiler.profiled('prevSong')
     async def prevSong(self, **kwargs):
-        service = MprisService(kwargs["playerId"])
-        service.player.Previous()
+        await backend.command(kwargs["playerId"], 'Previous')
 
+    @metrics.timed('nextSong')
+    @profiler.profiled('nextSong')
     async def nextSong(self, **kwargs):
-        service = MprisService(kwargs["playerId"])
-        service.player.Next()
+        await backend.command(kwargs["playerId"], 'Next')
+
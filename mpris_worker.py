@@ -0,0 +1,118 @@
+"""Helper process owning the session bus connection and the player cache
+
+main.py starts this when MEDIA_CONTROLS_WORKER is set and talks to it over a
+private peer-to-peer D-Bus connection, so marshalling, introspection and
+property conversion stay out of the plugin loader, and the cache stays warm
+when the plugin is reloaded. Replies are JSON strings, ready to hand to the
+frontend.
+
+    python3 mpris_worker.py unix:path=/path/to/worker.sock [session bus address]
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pip'))
+
+import asyncio
+import json
+import urllib.parse
+import dbus
+import dbus.server
+import dbus.service
+import main
+
+class NotFound(dbus.exceptions.DBusException):
+    _dbus_error_name = main.WORKER_NOT_FOUND
+
+class Worker(dbus.service.Object):
+    """The player cache of this process, exported to one plugin connection"""
+
+    def __init__(self, conn):
+        super().__init__(conn, main.WORKER_PATH)
+
+    @staticmethod
+    def _serve(coroutine, reply, error):
+        """Run coroutine on the event loop and reply with its result"""
+        def done(task):
+            try:
+                result = task.result()
+            except KeyError as e:
+                error(NotFound(*e.args))
+            except Exception as e:
+                error(e)
+            else:
+                reply(json.dumps(result))
+        asyncio.ensure_future(coroutine).add_done_callback(done)
+
+    @dbus.service.method(main.WORKER_INTERFACE, in_signature='xs', out_signature='s',
+                         async_callbacks=('reply', 'error'))
+    def GetPlayer(self, revision, epoch, reply, error):
+        # -1 asks for full snapshots, an empty epoch means ours
+        self._serve(main.local_backend.get_player(None if revision < 0 else revision, epoch or None),
+                    reply, error)
+
+    @dbus.service.method(main.WORKER_INTERFACE, in_signature='xds', out_signature='s',
+                         async_callbacks=('reply', 'error'))
+    def WaitForChange(self, revision, timeout, epoch, reply, error):
+        self._serve(main.local_backend.wait_for_change(revision, timeout, epoch or None), reply, error)
+
+    @dbus.service.method(main.WORKER_INTERFACE, in_signature='sss', out_signature='s',
+                         async_callbacks=('reply', 'error'))
+    def Command(self, player_id, command, args, reply, error):
+        self._serve(main.local_backend.command(player_id, command, *json.loads(args)), reply, error)
+
+    @dbus.service.method(main.WORKER_INTERFACE, in_signature='s', out_signature='s',
+                         async_callbacks=('reply', 'error'))
+    def GetArt(self, ref, reply, error):
+        self._serve(main.local_backend.get_art(ref), reply, error)
+
+    @dbus.service.method(main.WORKER_INTERFACE, in_signature='', out_signature='s',
+                         async_callbacks=('reply', 'error'))
+    def GetStats(self, reply, error):
+        self._serve(main.local_backend.get_stats(), reply, error)
+
+class WorkerServer(dbus.server.Server):
+    """Exports a Worker on every connection, and gives up after WORKER_IDLE_TIMEOUT without any"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.workers = {}
+        self.idle = asyncio.get_running_loop().create_future()
+        self._idle_timer = None
+        self._start_idle_timer()
+
+    def _start_idle_timer(self):
+        self._idle_timer = asyncio.get_running_loop().call_later(
+            main.WORKER_IDLE_TIMEOUT, main._resolve, self.idle, None)
+
+    def connection_added(self, conn):
+        self._idle_timer.cancel()
+        self.workers[conn] = Worker(conn)
+        super().connection_added(conn)
+
+    def connection_removed(self, conn):
+        worker = self.workers.pop(conn, None)
+        if worker is not None:
+            worker.remove_from_connection()
+        if not self.workers:
+            self._start_idle_timer()
+        super().connection_removed(conn)
+
+async def serve(address, bus_address=None):
+    if bus_address:
+        # main.py points at the Steam Deck user session on import, follow the plugin instead
+        os.environ['DBUS_SESSION_BUS_ADDRESS'] = bus_address
+    if address.startswith('unix:path='):
+        # on a fresh install nothing has made the cache directory yet
+        path = urllib.parse.unquote(address[len('unix:path='):].partition(',')[0])
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    # the session bus brings the asyncio main loop integration along, the server uses it too
+    main.session_bus()
+    server = WorkerServer(address)
+    # have the cache ready by the time the plugin asks
+    await main.local_backend.get_player()
+    await server.idle
+    server.disconnect()
+
+if __name__ == '__main__':
+    asyncio.run(serve(*sys.argv[1:3]))
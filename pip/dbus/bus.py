@@ -129,6 +129,18 @@ class BusConnection(Connection):
         bus._signal_sender_matches = {}
         """Map from SignalMatch to NameOwnerWatch."""
 
+        bus._name_owner_cache = {}
+        """Map from well-known name to the unique name of its owner, for
+        names in a namespace passed to `track_name_owners`."""
+
+        bus._name_owner_namespaces = {}
+        """Map from namespace to the SignalMatch keeping
+        `_name_owner_cache` up to date for it."""
+
+        bus._introspection_watches = {}
+        """Map from unique name to the NameOwnerWatch dropping its cached
+        introspection data when it leaves the bus."""
+
         return bus
 
     def add_signal_receiver(self, handler_function, signal_name=None,
@@ -169,22 +181,112 @@ class BusConnection(Connection):
         watch = self._signal_sender_matches.pop(match, None)
         if watch is not None:
             watch.cancel()
+        for namespace, tracker in list(self._name_owner_namespaces.items()):
+            if tracker is match:
+                # nothing keeps the cached owners up to date any more
+                del self._name_owner_namespaces[namespace]
+                for name in list(self._name_owner_cache):
+                    if not self._is_name_owner_tracked(name):
+                        self._name_owner_cache.pop(name, None)
+
+    def _can_cache_introspection(self, bus_name):
+        # Unique names are never reused, so the data stays valid as long
+        # as the name exists; we need a main loop to learn when it's gone.
+        if bus_name is None or bus_name[:1] != ':':
+            return False
+        try:
+            self._require_main_loop()
+        except RuntimeError:
+            return False
+        return True
+
+    def _cache_introspection(self, bus_name, object_path, method_map):
+        if not self._can_cache_introspection(bus_name):
+            return
+        if bus_name not in self._introspection_watches:
+            # one arg0 match per cached name, rather than receiving every
+            # NameOwnerChanged on the bus
+            def callback(new_owner):
+                if new_owner == '':
+                    self._drop_cached_introspection(bus_name)
+            self._introspection_watches[bus_name] = self.watch_name_owner(
+                bus_name, callback)
+        self._introspection_cache[(bus_name, object_path)] = method_map
+
+    def _drop_cached_introspection(self, bus_name):
+        watch = self._introspection_watches.pop(bus_name, None)
+        if watch is not None:
+            watch.cancel()
+        for key in [key for key in list(self._introspection_cache)
+                    if key[0] == bus_name]:
+            self._introspection_cache.pop(key, None)
 
     def activate_name_owner(self, bus_name):
         if (bus_name is not None and bus_name[:1] != ':'
             and bus_name != BUS_DAEMON_NAME):
+            owner = self._name_owner_cache.get(bus_name)
+            if owner:
+                return owner
             try:
-                return self.get_name_owner(bus_name)
+                owner = self.get_name_owner(bus_name)
             except DBusException as e:
                 if e.get_dbus_name() != _NAME_HAS_NO_OWNER:
                     raise
                 # else it doesn't exist: try to start it
                 self.start_service_by_name(bus_name)
-                return self.get_name_owner(bus_name)
+                owner = self.get_name_owner(bus_name)
+            if self._is_name_owner_tracked(bus_name):
+                # a NameOwnerChanged handled meanwhile is newer than our reply
+                owner = self._name_owner_cache.setdefault(bus_name, owner)
+            return owner
         else:
             # already unique
             return bus_name
 
+    def _is_name_owner_tracked(self, bus_name):
+        for namespace in list(self._name_owner_namespaces):
+            if (bus_name == namespace
+                or bus_name.startswith(namespace + '.')):
+                return True
+        return False
+
+    def track_name_owners(self, namespace, callback=None):
+        """Keep a local cache of the owners of all names in the given
+        namespace, so `activate_name_owner` (and hence `get_object`)
+        can resolve them without a GetNameOwner round-trip.
+
+        The cache is kept up to date from a single NameOwnerChanged
+        match rule using ``arg0namespace``, so a main loop is required.
+
+        :Parameters:
+            `namespace` : str
+                A well-known name; it and all names below it are tracked
+            `callback` : callable
+                If not None (the default), called with the arguments of
+                each NameOwnerChanged signal in the namespace after the
+                cache has been updated
+        :Returns: the `dbus.connection.SignalMatch` for the signal;
+            removing it stops tracking the namespace
+        """
+        cache = self._name_owner_cache
+
+        def name_owner_changed(name, old_owner, new_owner):
+            if new_owner:
+                cache[name] = new_owner
+            else:
+                cache.pop(name, None)
+            if callback is not None:
+                callback(name, old_owner, new_owner)
+
+        match = self.add_signal_receiver(name_owner_changed,
+                                         'NameOwnerChanged',
+                                         BUS_DAEMON_IFACE,
+                                         BUS_DAEMON_NAME,
+                                         BUS_DAEMON_PATH,
+                                         arg0namespace=namespace)
+        self._name_owner_namespaces[namespace] = match
+        return match
+
     def get_object(self, bus_name, object_path, introspect=True,
                    follow_name_owner_changes=False, **kwargs):
         """Return a local proxy for the given remote object.
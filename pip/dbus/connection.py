@@ -47,18 +47,48 @@ else:
 
 _logger = logging.getLogger('dbus.connection')
 
+_SIGNAL_INDEX_SIZE = 256
+"""Most (path, interface, member) combinations kept in a connection's
+signal dispatch index before it is started afresh."""
+
 
 def _noop(*args, **kwargs):
     pass
 
 
+class _MessageArgs(object):
+    """The arguments of one message, unmarshalled at most once for each
+    set of options and only when first asked for. _signal_func shares one
+    of these between all the matches a signal is offered to.
+    """
+
+    __slots__ = ('_message', '_decoded')
+
+    def __init__(self, message):
+        self._message = message
+        self._decoded = {}
+
+    def get(self, byte_arrays=False, utf8_strings=False):
+        # the options only make a difference to the result in these cases
+        key = (byte_arrays, is_py2 and utf8_strings)
+        args = self._decoded.get(key)
+        if args is None:
+            kwargs = dict(byte_arrays=byte_arrays)
+            if is_py2:
+                kwargs['utf8_strings'] = utf8_strings
+            args = self._message.get_args_list(**kwargs)
+            self._decoded[key] = args
+        return args
+
+
 class SignalMatch(object):
     _slots = ['_sender_name_owner', '_member', '_interface', '_sender',
               '_path', '_handler', '_args_match', '_rule',
               '_byte_arrays', '_conn_weakref',
               '_destination_keyword', '_interface_keyword',
               '_message_keyword', '_member_keyword',
-              '_sender_keyword', '_path_keyword', '_int_args_match']
+              '_sender_keyword', '_path_keyword', '_int_args_match',
+              '_arg0namespace']
     if is_py2:
         _slots.append('_utf8_strings')
 
@@ -105,11 +135,14 @@ class SignalMatch(object):
         self._destination_keyword = destination_keyword
 
         self._args_match = kwargs
+        self._arg0namespace = kwargs.get('arg0namespace')
         if not kwargs:
             self._int_args_match = None
         else:
             self._int_args_match = {}
             for kwarg in kwargs:
+                if kwarg == 'arg0namespace':
+                    continue
                 if not kwarg.startswith('arg'):
                     raise TypeError('SignalMatch: unknown keyword argument %s'
                                     % kwarg)
@@ -122,6 +155,8 @@ class SignalMatch(object):
                     raise TypeError('SignalMatch: arg match index must be in '
                                     'range(64), not %d' % index)
                 self._int_args_match[index] = kwargs[kwarg]
+            if not self._int_args_match:
+                self._int_args_match = None
 
     def __hash__(self):
         """SignalMatch objects are compared by identity."""
@@ -151,6 +186,8 @@ class SignalMatch(object):
             if self._int_args_match is not None:
                 for index, value in self._int_args_match.items():
                     rule.append("arg%d='%s'" % (index, value))
+            if self._arg0namespace is not None:
+                rule.append("arg0namespace='%s'" % self._arg0namespace)
 
             self._rule = ','.join(rule)
 
@@ -162,6 +199,16 @@ class SignalMatch(object):
 
     def set_sender_name_owner(self, new_name):
         self._sender_name_owner = new_name
+        conn = self._conn_weakref()
+        if conn is not None:
+            # the dispatch index files matches under their sender's owner
+            conn._invalidate_signal_index()
+
+    def _index_arg0(self):
+        """Return the value arg0 must have for this match, or None"""
+        if self._int_args_match is None:
+            return None
+        return self._int_args_match.get(0)
 
     def matches_removal_spec(self, sender, object_path,
                              dbus_interface, member, handler, **kwargs):
@@ -179,24 +226,36 @@ class SignalMatch(object):
             return False
         return True
 
-    def maybe_handle_message(self, message):
+    def maybe_handle_message(self, message, message_args=None):
         args = None
+        if message_args is None:
+            message_args = _MessageArgs(message)
 
         # these haven't been checked yet by the match tree
         if self._sender_name_owner not in (None, message.get_sender()):
             return False
-        if self._int_args_match is not None:
-            # extracting args with utf8_strings and byte_arrays is less work
-            kwargs = dict(byte_arrays=True)
+        if (self._int_args_match is not None
+            or self._arg0namespace is not None):
             arg_type = (String if is_py3 else UTF8String)
             if is_py2:
-                kwargs['utf8_strings'] = True
-            args = message.get_args_list(**kwargs)
-            for index, value in self._int_args_match.items():
+                # extracting args with utf8_strings and byte_arrays is
+                # less work
+                args = message_args.get(byte_arrays=True, utf8_strings=True)
+            else:
+                # only strings are compared, and those come out the same
+                # either way, so decode the way the handler wants them
+                args = message_args.get(byte_arrays=self._byte_arrays)
+            for index, value in (self._int_args_match or {}).items():
                 if (index >= len(args)
                     or not isinstance(args[index], arg_type)
                     or args[index] != value):
                     return False
+            if self._arg0namespace is not None:
+                if (not args or not isinstance(args[0], arg_type)
+                    or (args[0] != self._arg0namespace
+                        and not args[0].startswith(self._arg0namespace
+                                                   + '.'))):
+                    return False
 
         # these have likely already been checked by the match tree
         if self._member not in (None, message.get_member()):
@@ -210,12 +269,11 @@ class SignalMatch(object):
             # minor optimization: if we already extracted the args with the
             # right calling convention to do the args match, don't bother
             # doing so again
-            utf8_strings = (is_py2 and self._utf8_strings)
-            if args is None or not utf8_strings or not self._byte_arrays:
-                kwargs = dict(byte_arrays=self._byte_arrays)
-                if is_py2:
-                    kwargs['utf8_strings'] = self._utf8_strings
-                args = message.get_args_list(**kwargs)
+            if is_py3:
+                args = message_args.get(byte_arrays=self._byte_arrays)
+            else:
+                args = message_args.get(byte_arrays=self._byte_arrays,
+                                        utf8_strings=self._utf8_strings)
             kwargs = {}
             if self._sender_keyword is not None:
                 kwargs[self._sender_keyword] = message.get_sender()
@@ -273,8 +331,43 @@ class Connection(_Connection):
             self._signals_lock = threading.Lock()
             """Lock used to protect signal data structures"""
 
+            self._signal_index = {}
+            """Map from the (path, interface, member) of incoming signals
+            to the matches that may fire for them, grouped by the unique
+            name of the required sender and the required arg0 (None where
+            any will do). Filled in from the match tree as signals arrive
+            and replaced whenever the tree changes, see
+            `_get_signal_index_entry`."""
+
+            self._introspection_cache = {}
+            """Map from (bus name, object path) to the dict mapping method
+            names to signatures parsed from that object's introspection
+            data. Only used for bus names `_can_cache_introspection`
+            accepts."""
+
+            self._message_counts_lock = threading.Lock()
+            self._message_counts = {'sent': 0, 'received': 0}
+            """Number of messages sent and received through the Python
+            layer, see `get_message_counts`."""
+
             self.add_message_filter(self.__class__._signal_func)
 
+    def _count_message(self, direction):
+        with self._message_counts_lock:
+            self._message_counts[direction] += 1
+
+    def get_message_counts(self):
+        """Return a dict with the number of messages this connection has
+        sent and received since it was opened.
+
+        Method calls made through `call_async` and `call_blocking` and
+        their replies are counted, as well as every incoming message that
+        reaches the signal dispatcher. Messages sent directly with
+        `send_message` are not.
+        """
+        with self._message_counts_lock:
+            return dict(self._message_counts)
+
     def activate_name_owner(self, bus_name):
         """Return the unique name for the given bus name, activating it
         if necessary and possible.
@@ -291,6 +384,30 @@ class Connection(_Connection):
         """
         return bus_name
 
+    def _can_cache_introspection(self, bus_name):
+        """Return True if introspection data for objects owned by
+        `bus_name` may be reused by later proxies.
+
+        In this base class the other end of the connection may change
+        its objects at any time without telling us, so nothing is cached.
+        """
+        return False
+
+    def _get_cached_introspection(self, bus_name, object_path):
+        """Return the method signature map cached for the given object,
+        or None.
+        """
+        if not self._can_cache_introspection(bus_name):
+            return None
+        return self._introspection_cache.get((bus_name, object_path))
+
+    def _cache_introspection(self, bus_name, object_path, method_map):
+        """Remember the method signature map parsed from the given
+        object's introspection data, for use by later proxies.
+        """
+        if self._can_cache_introspection(bus_name):
+            self._introspection_cache[(bus_name, object_path)] = method_map
+
     def get_object(self, bus_name=None, object_path=None, introspect=True,
                    **kwargs):
         """Return a local proxy for the given remote object.
@@ -396,6 +513,11 @@ class Connection(_Connection):
                 is the value given for that keyword parameter. As of this
                 time only string arguments can be matched (in particular,
                 object paths and signatures can't).
+            `arg0namespace` : unicode or UTF-8 str
+                If not None (the default), match only signals whose first
+                argument is a bus or interface name equal to this
+                namespace, or below it (``org.example`` matches
+                ``org.example.Foo`` but not ``org.examples``).
             `named_service` : str
                 A deprecated alias for `bus_name`.
         """
@@ -423,6 +545,7 @@ class Connection(_Connection):
             matches = by_member.setdefault(signal_name, [])
 
             matches.append(match)
+            self._invalidate_signal_index()
         finally:
             self._signals_lock.release()
 
@@ -510,12 +633,91 @@ class Connection(_Connection):
                     del by_interface[dbus_interface]
                     if not by_interface:
                         del self._signal_recipients_by_object_path[path]
+            self._invalidate_signal_index()
         finally:
             self._signals_lock.release()
 
         for match in deletions:
             self._clean_up_signal_match(match)
 
+    def _invalidate_signal_index(self):
+        # replaced rather than cleared, _signal_func may be reading the old one
+        self._signal_index = {}
+
+    def _get_signal_index_entry(self, path, dbus_interface, member):
+        """Return the matches that may fire for a signal with the given
+        path, interface and member, as a dict mapping sender unique name
+        to a dict mapping arg0 to a list of (rank, match) pairs. The rank
+        gives the order in which the match tree would have yielded them.
+        """
+        index = self._signal_index
+        key = (path, dbus_interface, member)
+        entry = index.get(key)
+        if entry is not None:
+            return entry
+
+        entry = {}
+        self._signals_lock.acquire()
+        try:
+            for rank, match in enumerate(self._iter_easy_matches(
+                    path, dbus_interface, member)):
+                by_arg0 = entry.setdefault(match._sender_name_owner, {})
+                by_arg0.setdefault(match._index_arg0(), []).append(
+                    (rank, match))
+        finally:
+            self._signals_lock.release()
+        if len(index) >= _SIGNAL_INDEX_SIZE:
+            index.clear()
+        index[key] = entry
+        return entry
+
+    @staticmethod
+    def _signal_arg0(message_args):
+        """Return the first argument of the message if it is a string,
+        as SignalMatch compares it, else False
+        """
+        if is_py3:
+            # most handlers take the default options, share their decoding
+            args = message_args.get()
+            arg_type = String
+        else:
+            args = message_args.get(byte_arrays=True, utf8_strings=True)
+            arg_type = UTF8String
+        if not args or not isinstance(args[0], arg_type):
+            return False
+        return args[0]
+
+    def _iter_signal_candidates(self, message, message_args, entry):
+        """Yield the matches from a dispatch index entry that may fire
+        for the message, in match tree order.
+        """
+        sender = message.get_sender()
+        senders = (sender,) if sender is None else (sender, None)
+        groups = []
+        arg0 = None
+        for sender in senders:
+            by_arg0 = entry.get(sender)
+            if by_arg0 is None:
+                continue
+            group = by_arg0.get(None)
+            if group:
+                groups.append(group)
+            if len(by_arg0) > 1 or group is None:
+                # only now is arg0 worth unmarshalling
+                if arg0 is None:
+                    arg0 = self._signal_arg0(message_args)
+                group = by_arg0.get(arg0) if arg0 is not False else None
+                if group:
+                    groups.append(group)
+
+        if len(groups) == 1:
+            for rank, match in groups[0]:
+                yield match
+        elif groups:
+            for rank, match in sorted(
+                    pair for group in groups for pair in group):
+                yield match
+
     def _clean_up_signal_match(self, match):
         # Now called without the signals lock held (it was held in <= 0.81.0)
         pass
@@ -525,6 +727,7 @@ class Connection(_Connection):
         callbacks kept in the match-rule tree.
         """
 
+        self._count_message('received')
         if not isinstance(message, SignalMessage):
             return HANDLER_RESULT_NOT_YET_HANDLED
 
@@ -532,9 +735,13 @@ class Connection(_Connection):
         path = message.get_path()
         signal_name = message.get_member()
 
-        for match in self._iter_easy_matches(path, dbus_interface,
-                                             signal_name):
-            match.maybe_handle_message(message)
+        entry = self._get_signal_index_entry(path, dbus_interface,
+                                             signal_name)
+        if entry:
+            message_args = _MessageArgs(message)
+            for match in self._iter_signal_candidates(message, message_args,
+                                                      entry):
+                match.maybe_handle_message(message, message_args)
 
         if (dbus_interface == LOCAL_IFACE and
             path == LOCAL_PATH and
@@ -592,7 +799,10 @@ class Connection(_Connection):
             raise
 
         if reply_handler is None and error_handler is None:
-            # we don't care what happens, so just send it
+            # we don't care what happens, so just send it, and tell the
+            # other end not to bother replying
+            message.set_no_reply(True)
+            self._count_message('sent')
             self.send_message(message)
             return
 
@@ -602,6 +812,7 @@ class Connection(_Connection):
             error_handler = _noop
 
         def msg_reply_handler(message):
+            self._count_message('received')
             if isinstance(message, MethodReturnMessage):
                 reply_handler(*message.get_args_list(**get_args_opts))
             elif isinstance(message, ErrorMessage):
@@ -610,6 +821,7 @@ class Connection(_Connection):
             else:
                 error_handler(TypeError('Unexpected type for reply '
                                         'message: %r' % message))
+        self._count_message('sent')
         return self.send_message_with_reply(message, msg_reply_handler,
                                         timeout,
                                         require_main_loop=require_main_loop)
@@ -649,8 +861,10 @@ class Connection(_Connection):
             raise
 
         # make a blocking call
+        self._count_message('sent')
         reply_message = self.send_message_with_reply_and_block(
             message, timeout)
+        self._count_message('received')
         args_list = reply_message.get_args_list(**get_args_opts)
         if len(args_list) == 0:
             return None
@@ -35,7 +35,7 @@ NULL_MAIN_LOOP = _dbus_bindings.NULL_MAIN_LOOP
 
 For advanced users who want to dispatch events by hand. This is almost
 certainly a bad idea - if in doubt, use the GLib main loop found in
-`dbus.mainloop.glib`.
+`dbus.mainloop.glib`, or the asyncio one in `dbus.mainloop.asyncio`.
 """
 
 WATCH_READABLE = _dbus_bindings.WATCH_READABLE
@@ -60,5 +60,5 @@ __all__ = (
            'WATCH_HANGUP', 'WATCH_ERROR', 'NULL_MAIN_LOOP',
 
            # Submodules
-           'glib'
+           'asyncio', 'glib'
            )
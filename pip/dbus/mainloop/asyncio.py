@@ -0,0 +1,395 @@
+# SPDX-License-Identifier: MIT
+#
+# Permission is hereby granted, free of charge, to any person
+# obtaining a copy of this software and associated documentation
+# files (the "Software"), to deal in the Software without
+# restriction, including without limitation the rights to use, copy,
+# modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+"""asyncio main loop integration, without GLib.
+
+The watches and timeouts of each connection are handed straight from
+libdbus to an asyncio event loop, so replies to `call_async`, signals
+and method calls on exported objects are dispatched as ordinary asyncio
+callbacks on that loop's thread.
+
+Connections should be used from the thread running the loop. Watch and
+timeout changes made by libdbus on other threads are forwarded to the
+loop with `call_soon_threadsafe`.
+"""
+
+__all__ = ('DBusAsyncioMainLoop',)
+
+import asyncio
+import ctypes
+import itertools
+
+import _dbus_bindings
+from dbus.mainloop import WATCH_READABLE, WATCH_WRITABLE
+
+_libdbus = ctypes.CDLL('libdbus-1.so.3')
+
+_dbus_bool_t = ctypes.c_uint32
+_DISPATCH_DATA_REMAINS = 0
+
+_AddFunction = ctypes.CFUNCTYPE(_dbus_bool_t, ctypes.c_void_p, ctypes.c_void_p)
+_RemoveFunction = ctypes.CFUNCTYPE(None, ctypes.c_void_p, ctypes.c_void_p)
+_FreeFunction = ctypes.CFUNCTYPE(None, ctypes.c_void_p)
+_DispatchStatusFunction = ctypes.CFUNCTYPE(
+    None, ctypes.c_void_p, ctypes.c_int, ctypes.c_void_p)
+
+def _prototype(name, restype, *argtypes):
+    function = getattr(_libdbus, name)
+    function.restype = restype
+    function.argtypes = argtypes
+    return function
+
+for _name in ('dbus_connection_set_watch_functions',
+              'dbus_connection_set_timeout_functions',
+              'dbus_server_set_watch_functions',
+              'dbus_server_set_timeout_functions'):
+    _prototype(_name, _dbus_bool_t, ctypes.c_void_p, _AddFunction,
+               _RemoveFunction, _RemoveFunction, ctypes.c_void_p,
+               _FreeFunction)
+_prototype('dbus_connection_set_wakeup_main_function', None,
+           ctypes.c_void_p, _FreeFunction, ctypes.c_void_p, _FreeFunction)
+_prototype('dbus_connection_set_dispatch_status_function', None,
+           ctypes.c_void_p, _DispatchStatusFunction, ctypes.c_void_p,
+           _FreeFunction)
+_prototype('dbus_connection_get_dispatch_status', ctypes.c_int,
+           ctypes.c_void_p)
+_prototype('dbus_connection_dispatch', ctypes.c_int, ctypes.c_void_p)
+_prototype('dbus_watch_get_unix_fd', ctypes.c_int, ctypes.c_void_p)
+_prototype('dbus_watch_get_flags', ctypes.c_uint, ctypes.c_void_p)
+_prototype('dbus_watch_get_enabled', _dbus_bool_t, ctypes.c_void_p)
+_prototype('dbus_watch_handle', _dbus_bool_t, ctypes.c_void_p, ctypes.c_uint)
+_prototype('dbus_timeout_get_interval', ctypes.c_int, ctypes.c_void_p)
+_prototype('dbus_timeout_get_enabled', _dbus_bool_t, ctypes.c_void_p)
+_prototype('dbus_timeout_handle', _dbus_bool_t, ctypes.c_void_p)
+
+# _dbus_bindings exports a small C API for main loop implementations:
+# [0] points to the number of entries, [1] is
+# DBusPyConnection_BorrowDBusConnection and [2] DBusPyNativeMainLoop_New4.
+ctypes.pythonapi.PyCapsule_GetPointer.restype = ctypes.c_void_p
+ctypes.pythonapi.PyCapsule_GetPointer.argtypes = [ctypes.py_object,
+                                                  ctypes.c_char_p]
+_c_api = (ctypes.c_void_p * 3).from_address(
+    ctypes.pythonapi.PyCapsule_GetPointer(_dbus_bindings._C_API,
+                                          b'_dbus_bindings._C_API'))
+_new_main_loop = ctypes.PYFUNCTYPE(
+    ctypes.py_object, _AddFunction, _AddFunction, _FreeFunction,
+    ctypes.c_void_p)(_c_api[2])
+
+# Python objects handed to libdbus as user data, by the integer passed
+# in their place. Entries are dropped when libdbus frees the data.
+_handles = itertools.count(1)
+_objects = {}
+
+def _register(obj):
+    handle = next(_handles)
+    _objects[handle] = obj
+    return handle
+
+def _callback(method_name):
+    """Make a C callback forwarding to the named method of the object
+    registered under the user data pointer.
+    """
+    def callback(pointer, data):
+        obj = _objects.get(data)
+        if obj is None:
+            return False
+        return getattr(obj, method_name)(pointer)
+    return callback
+
+@_FreeFunction
+def _free(data):
+    _objects.pop(data, None)
+
+
+class _Watcher(object):
+    """Runs the watches and timeouts of a connection or server on an
+    asyncio event loop.
+    """
+
+    def __init__(self, loop):
+        self._loop = loop
+        # DBusWatch pointer -> [fd, flags, enabled]
+        self._watches = {}
+        # DBusTimeout pointer -> [interval in seconds, asyncio.TimerHandle]
+        self._timeouts = {}
+
+    def _call(self, function, *args):
+        """Run function on the loop's thread, now if this is that thread"""
+        if self._loop.is_closed():
+            # libdbus still has things to say while connections are torn down
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop or (running is None and
+                                     not self._loop.is_running()):
+            function(*args)
+        else:
+            self._loop.call_soon_threadsafe(function, *args)
+
+    # The C callbacks read everything they need from libdbus right away,
+    # the watch or timeout may be gone by the time a forwarded call runs.
+
+    def add_watch(self, watch):
+        self._call(self._set_watch, watch, [
+            _libdbus.dbus_watch_get_unix_fd(watch),
+            _libdbus.dbus_watch_get_flags(watch),
+            bool(_libdbus.dbus_watch_get_enabled(watch))])
+        return True
+
+    def watch_toggled(self, watch):
+        self._call(self._toggle_watch, watch,
+                   bool(_libdbus.dbus_watch_get_enabled(watch)))
+
+    def remove_watch(self, watch):
+        self._call(self._remove_watch, watch)
+
+    def _set_watch(self, watch, state):
+        self._watches[watch] = state
+        self._update_fd(state[0])
+
+    def _toggle_watch(self, watch, enabled):
+        state = self._watches.get(watch)
+        if state is not None:
+            state[2] = enabled
+            self._update_fd(state[0])
+
+    def _remove_watch(self, watch):
+        state = self._watches.pop(watch, None)
+        if state is not None:
+            self._update_fd(state[0])
+
+    def _update_fd(self, fd):
+        # libdbus watches reading and writing separately, usually on the
+        # same fd, while asyncio keeps one reader and one writer per fd
+        flags = 0
+        for watch_fd, watch_flags, enabled in self._watches.values():
+            if watch_fd == fd and enabled:
+                flags |= watch_flags
+        if flags & WATCH_READABLE:
+            self._loop.add_reader(fd, self._handle_fd, fd, WATCH_READABLE)
+        else:
+            self._loop.remove_reader(fd)
+        if flags & WATCH_WRITABLE:
+            self._loop.add_writer(fd, self._handle_fd, fd, WATCH_WRITABLE)
+        else:
+            self._loop.remove_writer(fd)
+
+    def _handle_fd(self, fd, condition):
+        for watch, (watch_fd, flags, enabled) in list(self._watches.items()):
+            # handling one watch may remove the others
+            if (watch_fd == fd and enabled and flags & condition and
+                    watch in self._watches):
+                # hangups and errors are reported as readable by asyncio,
+                # libdbus notices them itself when it reads
+                _libdbus.dbus_watch_handle(watch, condition)
+        self._handled()
+
+    def add_timeout(self, timeout):
+        self._call(self._set_timeout, timeout,
+                   _libdbus.dbus_timeout_get_interval(timeout) / 1000.0,
+                   bool(_libdbus.dbus_timeout_get_enabled(timeout)))
+        return True
+
+    def timeout_toggled(self, timeout):
+        self._call(self._set_timeout, timeout,
+                   _libdbus.dbus_timeout_get_interval(timeout) / 1000.0,
+                   bool(_libdbus.dbus_timeout_get_enabled(timeout)))
+
+    def remove_timeout(self, timeout):
+        self._call(self._remove_timeout, timeout)
+
+    def _set_timeout(self, timeout, interval, enabled):
+        self._remove_timeout(timeout)
+        if enabled:
+            self._timeouts[timeout] = [interval, self._loop.call_later(
+                interval, self._handle_timeout, timeout)]
+
+    def _remove_timeout(self, timeout):
+        state = self._timeouts.pop(timeout, None)
+        if state is not None:
+            state[1].cancel()
+
+    def _handle_timeout(self, timeout):
+        state = self._timeouts[timeout]
+        _libdbus.dbus_timeout_handle(timeout)
+        # libdbus timeouts repeat until they are removed or toggled
+        if self._timeouts.get(timeout) is state:
+            state[1] = self._loop.call_later(
+                state[0], self._handle_timeout, timeout)
+        self._handled()
+
+    def _handled(self):
+        """Called after libdbus got to handle a watch or timeout"""
+        pass
+
+    def _install(self, set_watch_functions, set_timeout_functions, pointer):
+        handle = _register(self)
+        if not set_watch_functions(pointer, _add_watch, _remove_watch,
+                                   _watch_toggled, handle, _free):
+            return False
+        # the timeouts get a handle of their own, libdbus frees each
+        # function's user data separately
+        return bool(set_timeout_functions(
+            pointer, _add_timeout, _remove_timeout, _timeout_toggled,
+            _register(self), _free))
+
+
+class _ConnectionWatcher(_Watcher):
+    """Runs a DBusConnection on an asyncio event loop, including the
+    dispatching of the messages it receives.
+    """
+
+    def __init__(self, loop, connection):
+        super(_ConnectionWatcher, self).__init__(loop)
+        self._connection = connection
+        self._dispatch_scheduled = False
+
+    def set_up(self):
+        if not self._install(_libdbus.dbus_connection_set_watch_functions,
+                             _libdbus.dbus_connection_set_timeout_functions,
+                             self._connection):
+            return False
+        # the connection is gone once libdbus frees this handle
+        handle = _register(self)
+        _libdbus.dbus_connection_set_dispatch_status_function(
+            self._connection, _dispatch_status_changed, handle,
+            _connection_freed)
+        _libdbus.dbus_connection_set_wakeup_main_function(
+            self._connection, _wakeup_main, _register(self), _free)
+        # messages may have arrived before we were watching, e.g. during
+        # the blocking Hello
+        self._call(self._handled)
+        return True
+
+    def dispatch_status_changed(self, status):
+        if status == _DISPATCH_DATA_REMAINS:
+            self._call(self._schedule_dispatch)
+
+    def wakeup_main(self):
+        self._call(self._handled)
+
+    def freed(self):
+        self._connection = None
+
+    def _handled(self):
+        if (self._connection is not None and
+                _libdbus.dbus_connection_get_dispatch_status(
+                    self._connection) == _DISPATCH_DATA_REMAINS):
+            self._schedule_dispatch()
+
+    def _schedule_dispatch(self):
+        if not self._dispatch_scheduled:
+            self._dispatch_scheduled = True
+            self._loop.call_soon(self._dispatch)
+
+    def _dispatch(self):
+        self._dispatch_scheduled = False
+        if self._connection is None:
+            return
+        # one message per loop iteration, so a burst of signals can't
+        # starve the other callbacks on the loop
+        if (_libdbus.dbus_connection_dispatch(self._connection) ==
+                _DISPATCH_DATA_REMAINS):
+            self._schedule_dispatch()
+
+
+class _ServerWatcher(_Watcher):
+    """Runs a DBusServer on an asyncio event loop. New connections are
+    set up with the server's main loop, like any other connection.
+    """
+
+    def __init__(self, loop, server):
+        super(_ServerWatcher, self).__init__(loop)
+        self._server = server
+
+    def set_up(self):
+        return self._install(_libdbus.dbus_server_set_watch_functions,
+                             _libdbus.dbus_server_set_timeout_functions,
+                             self._server)
+
+
+_add_watch = _AddFunction(_callback('add_watch'))
+_remove_watch = _RemoveFunction(_callback('remove_watch'))
+_watch_toggled = _RemoveFunction(_callback('watch_toggled'))
+_add_timeout = _AddFunction(_callback('add_timeout'))
+_remove_timeout = _RemoveFunction(_callback('remove_timeout'))
+_timeout_toggled = _RemoveFunction(_callback('timeout_toggled'))
+
+@_DispatchStatusFunction
+def _dispatch_status_changed(connection, status, data):
+    watcher = _objects.get(data)
+    if watcher is not None:
+        watcher.dispatch_status_changed(status)
+
+@_FreeFunction
+def _wakeup_main(data):
+    watcher = _objects.get(data)
+    if watcher is not None:
+        watcher.wakeup_main()
+
+@_FreeFunction
+def _connection_freed(data):
+    watcher = _objects.pop(data, None)
+    if watcher is not None:
+        watcher.freed()
+
+@_AddFunction
+def _set_up_connection(connection, data):
+    return _ConnectionWatcher(_objects[data], connection).set_up()
+
+@_AddFunction
+def _set_up_server(server, data):
+    return _ServerWatcher(_objects[data], server).set_up()
+
+
+def DBusAsyncioMainLoop(set_as_default=False, loop=None):
+    """Return a NativeMainLoop that runs D-Bus connections on an asyncio
+    event loop.
+
+    :Parameters:
+        `set_as_default` : bool
+            If true, make it the default main loop for new connections,
+            like ``DBusGMainLoop(set_as_default=True)``
+        `loop` : asyncio.AbstractEventLoop
+            The event loop to use; by default the running loop, or the
+            current thread's loop if none is running
+    """
+    if loop is None:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = asyncio.get_event_loop()
+    main_loop = _new_main_loop(_set_up_connection, _set_up_server, _free,
+                               _register(loop))
+    if set_as_default:
+        _dbus_bindings.set_default_main_loop(main_loop)
+    return main_loop
+
+# libdbus holds on to these for as long as a connection lives, which can be
+# past this module's teardown at interpreter exit; they must never be freed
+for _function in (_free, _add_watch, _remove_watch, _watch_toggled,
+                  _add_timeout, _remove_timeout, _timeout_toggled,
+                  _dispatch_status_changed, _wakeup_main, _connection_freed,
+                  _set_up_connection, _set_up_server):
+    ctypes.pythonapi.Py_IncRef(ctypes.py_object(_function))
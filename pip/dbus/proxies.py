@@ -262,6 +262,14 @@ class ProxyObject(object):
 
         if not introspect or self.__dbus_object_path__ == LOCAL_PATH:
             self._introspect_state = self.INTROSPECT_STATE_DONT_INTROSPECT
+            return
+
+        # another proxy for the same object may have introspected it already
+        method_map = conn._get_cached_introspection(
+            self._named_service, self.__dbus_object_path__)
+        if method_map is not None:
+            self._introspect_method_map = method_map
+            self._introspect_state = self.INTROSPECT_STATE_INTROSPECT_DONE
         else:
             self._introspect_state = self.INTROSPECT_STATE_INTROSPECT_IN_PROGRESS
 
@@ -397,6 +405,9 @@ class ProxyObject(object):
             except IntrospectionParserException as e:
                 self._introspect_error_handler(e)
                 return
+            self._bus._cache_introspection(self._named_service,
+                                           self.__dbus_object_path__,
+                                           self._introspect_method_map)
 
             self._introspect_state = self.INTROSPECT_STATE_INTROSPECT_DONE
             self._pending_introspect = None
@@ -1,36 +1,55 @@
 import * as React from "react";
-import { getPlayers, MprisPlayerState } from "../mprisInterfase";
+import { MprisPlayerState, waitForChange } from "../mprisInterfase";
 
 import "./../assets/scss/App.scss";
 
 import { Player } from "./player/Player";
 
-let loopId = -1
+// Seconds the backend may hold a wait_for_change request
+const WAIT_TIMEOUT = 10;
+// Back-off before asking again after a failed request
+const RETRY_DELAY = 1000;
+
+let listening = false;
+let focused = true;
 
 function MediaControls() {
   const [mprisPlayers, setMprisPlayers] = React.useState<MprisPlayerState[]>([]);
-  const fetchData = async () => {
-    setMprisPlayers(await getPlayers());
+  // Instead of polling, keep one request parked on the backend while the menu has focus.
+  // The first request answers right away, since we have no revision yet.
+  const listen = async () => {
+    if (listening) {
+      return;
+    }
+    listening = true;
+    while (focused) {
+      try {
+        const players = await waitForChange(WAIT_TIMEOUT);
+        if (players) {
+          setMprisPlayers(players);
+        }
+      } catch (_error) {
+        await new Promise((resolve) => window.setTimeout(resolve, RETRY_DELAY));
+      }
+    }
+    listening = false;
   }
 
-  React.useEffect(() => {
-    fetchData().catch()
-  }, []);
-
   React.useEffect(() => {
     window.addEventListener('focus', (_event) => {
-      loopId = window.setInterval(fetchData, 1000);
+      focused = true;
+      listen();
     });
 
     window.addEventListener('blur', (_event) => {
-      window.clearInterval(loopId);
+      focused = false;
     });
 
-    loopId = window.setInterval(fetchData, 1000);
+    listen();
   }, [])
 
   const players = mprisPlayers.map ((player) => {
-    return Player(player)
+    return <Player key={player.id} playerState={player} />
   })
 
   return (
@@ -1,11 +1,33 @@
 import * as React from "react";
+import { getArt } from "../../mprisInterfase";
 
 export interface MediaArtProps {
-    url: string
+    url: string,
+    artRef: string | null,
 }
 
 // TODO: Animate transition
 
 export function MediaArt(props: MediaArtProps) {
-    return <div className="media_art" style={{ backgroundImage: `url(${props.url})` }}></div>
+    const { url, artRef } = props;
+    const [cachedUrl, setCachedUrl] = React.useState<string | null>(null);
+
+    React.useEffect(() => {
+        let current = true;
+        setCachedUrl(null);
+        if (artRef) {
+            getArt(artRef).then((art) => {
+                if (current) {
+                    setCachedUrl(art);
+                }
+            }).catch(() => undefined);
+        }
+        return () => {
+            current = false;
+        };
+    }, [artRef]);
+
+    // Without a reference the backend could not cache it, e.g. remote art the webview loads itself
+    const src = artRef ? cachedUrl : url;
+    return <div className="media_art" style={{ backgroundImage: src ? `url(${src})` : undefined }}></div>
 }
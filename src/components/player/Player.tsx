@@ -1,18 +1,32 @@
 import * as React from "react";
-import { MprisPlayerState } from "../../mprisInterfase";
+import { MprisPlayerState, seek, setVolume } from "../../mprisInterfase";
 import { MediaArt } from "./MediaArt";
 import { MediaControls } from "./MediaControls";
 import { MediaInfo } from "./MediaInfo";
+import { ProgressBar } from "./ProgressBar";
+import { VolumeSlider } from "./VolumeSlider";
 
-export function Player(playerState: MprisPlayerState) {
-    const { artist, title, properties } = playerState;
-    const {Metadata} = properties
+export interface PlayerProps {
+    playerState: MprisPlayerState
+}
+
+// Memoized: unchanged players keep the same state object between polls
+export const Player = React.memo(function Player(props: PlayerProps) {
+    const { playerState } = props;
+    const { id, artist, title, artRef, position, properties } = playerState;
+    const { Metadata, CanSeek, CanControl, Volume } = properties
+
+    const onSeek = CanSeek ? (to: number) => { seek(id, to); } : undefined;
+    const onVolumeChange = (volume: number) => { setVolume(id, volume); };
 
     return (
     <div className="player">
-        <MediaArt url={Metadata["mpris:artUrl"]}></MediaArt>
+        <MediaArt url={Metadata["mpris:artUrl"]} artRef={artRef}></MediaArt>
         <MediaInfo artist={artist} title={title} ></MediaInfo>
         <MediaControls playerState={playerState}></MediaControls>
+        {CanControl && Volume !== undefined &&
+            <VolumeSlider volume={Volume} onChange={onVolumeChange}></VolumeSlider>}
+        <ProgressBar anchor={position} length={Metadata["mpris:length"]} onSeek={onSeek}></ProgressBar>
     </div>
     )
-}
+})
@@ -0,0 +1,67 @@
+import * as React from "react";
+import { PositionAnchor } from "../../mprisInterfase";
+
+export interface ProgressBarProps {
+    anchor: PositionAnchor | null,
+    // Track length in microseconds
+    length: number,
+    // Called with the position (microseconds) the user clicked or dragged to, if seeking is possible
+    onSeek?: (position: number) => void,
+}
+
+function positionAt(anchor: PositionAnchor, now: number) {
+    return anchor.position + (now - anchor.timestamp) * 1000 * anchor.rate;
+}
+
+// The backend only sends a new anchor on seeks, rate and status changes;
+// in between the bar is moved every frame without going through React
+export function ProgressBar(props: ProgressBarProps) {
+    const { anchor, length, onSeek } = props;
+    const fill = React.useRef<HTMLDivElement>(null);
+
+    React.useEffect(() => {
+        if (!anchor || !length) {
+            return;
+        }
+        let frame = 0;
+        const draw = () => {
+            const progress = Math.min(Math.max(positionAt(anchor, Date.now()) / length, 0), 1);
+            if (fill.current) {
+                fill.current.style.width = `${progress * 100}%`;
+            }
+            if (anchor.rate !== 0) {
+                frame = window.requestAnimationFrame(draw);
+            }
+        };
+        draw();
+        return () => window.cancelAnimationFrame(frame);
+    }, [anchor, length]);
+
+    if (!anchor || !length) {
+        return null;
+    }
+
+    const seekTo = (event: React.PointerEvent<HTMLDivElement>) => {
+        const bounds = event.currentTarget.getBoundingClientRect();
+        const progress = Math.min(Math.max((event.clientX - bounds.left) / bounds.width, 0), 1);
+        onSeek?.(progress * length);
+    };
+
+    const onPointerDown = (event: React.PointerEvent<HTMLDivElement>) => {
+        event.currentTarget.setPointerCapture(event.pointerId);
+        seekTo(event);
+    };
+
+    const onPointerMove = (event: React.PointerEvent<HTMLDivElement>) => {
+        if (event.currentTarget.hasPointerCapture(event.pointerId)) {
+            seekTo(event);
+        }
+    };
+
+    return (
+        <div className={onSeek ? "progress_bar seekable" : "progress_bar"}
+            onPointerDown={onSeek && onPointerDown} onPointerMove={onSeek && onPointerMove}>
+            <div className="progress_fill" ref={fill}></div>
+        </div>
+    )
+}
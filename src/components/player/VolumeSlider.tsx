@@ -0,0 +1,51 @@
+import * as React from "react";
+
+// How long the slider keeps showing its own value after being let go, until the player caught up
+const RELEASE_DELAY = 1500;
+
+export interface VolumeSliderProps {
+    volume: number,
+    onChange: (volume: number) => void,
+}
+
+// Every input event goes to the backend, which only forwards the latest value to the player.
+// The cached Volume lags behind meanwhile, so the slider holds on to the value under the finger.
+export function VolumeSlider(props: VolumeSliderProps) {
+    const { volume, onChange } = props;
+    const [held, setHeld] = React.useState<number | null>(null);
+    const dragging = React.useRef(false);
+    const release = React.useRef<number>();
+
+    React.useEffect(() => () => window.clearTimeout(release.current), []);
+
+    const letGo = () => {
+        window.clearTimeout(release.current);
+        release.current = window.setTimeout(() => setHeld(null), RELEASE_DELAY);
+    };
+
+    const onInput = (event: React.ChangeEvent<HTMLInputElement>) => {
+        const value = parseFloat(event.target.value);
+        window.clearTimeout(release.current);
+        setHeld(value);
+        onChange(value);
+        // Steps from a gamepad or keyboard come without a drag to wait for
+        if (!dragging.current) {
+            letGo();
+        }
+    };
+
+    const onPointerDown = () => {
+        dragging.current = true;
+        window.clearTimeout(release.current);
+    };
+
+    const onPointerUp = () => {
+        dragging.current = false;
+        letGo();
+    };
+
+    return (
+        <input className="volume_slider" type="range" min={0} max={1} step={0.01} value={held ?? volume}
+            onChange={onInput} onPointerDown={onPointerDown} onPointerUp={onPointerUp} onPointerCancel={onPointerUp} />
+    )
+}
@@ -3,11 +3,22 @@ declare function call_plugin_method(methodName: string, arguments: {}): Promise<
 export type playbackStatus = "Paused" | "Playing"
 export type mprisBool = 0 | 1
 
+// Playback position in microseconds at timestamp (ms, same clock as Date.now()),
+// advancing by rate microseconds per microsecond from there
+export interface PositionAnchor {
+    position: number,
+    rate: number,
+    timestamp: number,
+}
+
 export interface MprisPlayerState {
     id: string,
     artist: string,
     title: string,
     playbackStatus: playbackStatus,
+    // Reference to the album art in the backend cache, see getArt
+    artRef: string | null,
+    position: PositionAnchor | null,
     baseProps: {
         CanQuit: mprisBool,
         CanRaise: mprisBool,
@@ -55,6 +66,103 @@ export async function nextSong(playerId: string) {
     await call_plugin_method("nextSong", { playerId });
 }
 
-export async function getPlayers(): Promise<MprisPlayerState[]> {
-    return await call_plugin_method("get_player", {});
+type PlayerDelta = Partial<Omit<MprisPlayerState, "baseProps" | "properties">> & {
+    id: string,
+    baseProps: Partial<MprisPlayerState["baseProps"]>,
+    properties: Partial<MprisPlayerState["properties"]>,
+}
+
+// epoch names the backend process that counted revision, see EPOCH in main.py
+type PlayersUpdate =
+    | { revision: number, epoch: string, notModified: true }
+    | { revision: number, epoch: string, ids: string[], players: PlayerDelta[] }
+
+let revision = 0;
+let epoch: string | null = null;
+let knownPlayers = new Map<string, MprisPlayerState>();
+
+// Applies the changes since our last known revision on top of the players we have.
+// Players that did not change keep their identity, so React can skip re-rendering them.
+function applyUpdate(update: PlayersUpdate): MprisPlayerState[] | null {
+    revision = update.revision;
+    if (update.epoch !== epoch) {
+        // Another backend process, it sent everything and nothing we have is current
+        epoch = update.epoch;
+        knownPlayers = new Map();
+    }
+    if ("notModified" in update) {
+        return null;
+    }
+
+    const players = new Map<string, MprisPlayerState>();
+    update.ids.forEach((id) => {
+        const player = knownPlayers.get(id);
+        if (player) {
+            players.set(id, player);
+        }
+    });
+    update.players.forEach((delta) => {
+        const player = players.get(delta.id);
+        players.set(delta.id, {
+            ...player,
+            ...delta,
+            baseProps: { ...player?.baseProps, ...delta.baseProps },
+            properties: { ...player?.properties, ...delta.properties },
+        } as MprisPlayerState);
+    });
+
+    knownPlayers = players;
+    return Array.from(players.values());
+}
+
+const ART_CACHE_SIZE = 16;
+const artCache = new Map<string, Promise<string | null>>();
+
+// Loads album art from the backend cache, each reference is only fetched until it succeeds
+export function getArt(artRef: string): Promise<string | null> {
+    let art = artCache.get(artRef);
+    if (!art) {
+        const pending: Promise<string | null> = call_plugin_method("get_art", { artRef });
+        // Failures and missing art are not remembered, the next call asks again
+        const forget = () => {
+            if (artCache.get(artRef) === art) {
+                artCache.delete(artRef);
+            }
+        };
+        art = pending.then((uri) => {
+            if (uri === null) {
+                forget();
+            }
+            return uri;
+        }, (error) => {
+            forget();
+            throw error;
+        });
+        artCache.set(artRef, art);
+        // Maps iterate in insertion order, the first key is the oldest
+        if (artCache.size > ART_CACHE_SIZE) {
+            artCache.delete(artCache.keys().next().value);
+        }
+    }
+    return art;
+}
+
+// Jump to position (microseconds). The backend only sends the latest of rapid calls, so sliders can call this freely
+export async function seek(playerId: string, position: number) {
+    await call_plugin_method("seek", { playerId, position: Math.round(position) });
+}
+
+// Volume from 0 to 1, coalesced by the backend like seek
+export async function setVolume(playerId: string, volume: number) {
+    await call_plugin_method("setVolume", { playerId, volume });
+}
+
+// Resolves to null when nothing changed since the last call
+export async function getPlayers(): Promise<MprisPlayerState[] | null> {
+    return applyUpdate(await call_plugin_method("get_player", { revision, epoch }));
+}
+
+// Like getPlayers, but the backend holds the request until something changes or timeout seconds pass
+export async function waitForChange(timeout: number): Promise<MprisPlayerState[] | null> {
+    return applyUpdate(await call_plugin_method("wait_for_change", { revision, timeout, epoch }));
 }